@@ -1,9 +1,19 @@
 import cv2
+import numpy as np
+from helpers.buffer_helpers import opencv_dst, resolve_out
+from helpers.profiling import profiled
 
-def apply_invert(image):
+@profiled
+def apply_invert(image, out=None):
     """
     Invert the colors of the image.
     Creates a negative version of the original image.
+    out: optional destination array or BufferPool (may be the image itself)
     """
     # inverts each pixel value: 255 - value.
-    return cv2.bitwise_not(image)
\ No newline at end of file
+    if out is None:
+        return cv2.bitwise_not(image)
+    dest = resolve_out(out, image.shape, image.dtype)
+    if opencv_dst(dest) is None:
+        return np.bitwise_not(image, out=dest)
+    return cv2.bitwise_not(image, dst=dest)  # element-wise, so in place is fine
\ No newline at end of file
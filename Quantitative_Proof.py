@@ -1,32 +1,154 @@
-
+import hashlib
+from collections import OrderedDict
 
 import cv2
 import numpy as np
 
+from helpers.profiling import profiled
+
+# Every measure focus_metrics() returns; higher means sharper for all of them
+FOCUS_METRICS = ("laplacian_var", "sobel_energy", "tenengrad", "brenner", "normalized_variance")
+
+# Rows per band: small enough that a band's temporaries stay in cache
+BAND_ROWS = 64
+
+METRICS_CACHE_SIZE = 64
+_metrics_cache = OrderedDict()
+
+
+def to_gray(image: np.ndarray) -> np.ndarray:
+    """Grayscale plane used by every focus measure (BGR input as loaded by OpenCV)"""
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def clear_metrics_cache():
+    """Forget all memoized focus metrics"""
+    _metrics_cache.clear()
+
+
+def _digest(gray: np.ndarray) -> bytes:
+    """Content hash of a plane (with shape and dtype, so equal bytes of other layouts differ)"""
+    digest = hashlib.sha256()
+    digest.update(f"{gray.shape}{gray.dtype}".encode("ascii"))
+    digest.update(np.ascontiguousarray(gray).data)
+    return digest.digest()
+
+
+class _Moments:
+    """Running count, sum and sum of squares, updated one band at a time"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, values):
+        flat = values.ravel().astype(np.float64)
+        self.count += flat.size
+        self.total += flat.sum()
+        self.total_sq += flat @ flat
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def var(self):
+        return max(self.total_sq / self.count - self.mean ** 2, 0.0) if self.count else 0.0
+
+
+def _compute_metrics(gray: np.ndarray) -> dict:
+    """
+    All focus measures in one pass over the plane, band by band.
+    Each band carries one halo row above and below so the 3x3 operators see
+    the same neighbours (and the same image-border handling) as a
+    whole-image call.
+    """
+    exact = gray.dtype == np.uint8
+    ddepth = cv2.CV_16S if exact else cv2.CV_64F  # int16 is exact for 8-bit input
+    work = np.float32 if exact else np.float64
+
+    laplacian, gray_moments = _Moments(), _Moments()
+    sobel_sum = tenengrad_sum = brenner_sum = 0.0
+    brenner_count = 0
+    height = gray.shape[0]
+
+    for top in range(0, height, BAND_ROWS):
+        bottom = min(top + BAND_ROWS, height)
+        lo, hi = max(top - 1, 0), min(bottom + 1, height)
+        band = gray[lo:hi]
+        core = slice(top - lo, top - lo + bottom - top)
+
+        laplacian.add(cv2.Laplacian(band, ddepth)[core])
+
+        gx = cv2.Sobel(band, ddepth, 1, 0, ksize=3)[core].astype(work)
+        gy = cv2.Sobel(band, ddepth, 0, 1, ksize=3)[core].astype(work)
+        energy = gx * gx
+        energy += gy * gy  # exact in float32 for 8-bit input
+        tenengrad_sum += energy.sum(dtype=np.float64)
+        np.sqrt(energy, out=energy)
+        sobel_sum += energy.sum(dtype=np.float64)
+
+        rows = gray[top:bottom]
+        gray_moments.add(rows)
+        if rows.shape[1] > 2:
+            diff = rows[:, 2:].astype(work) - rows[:, :-2]
+            brenner_sum += float(np.einsum("ij,ij->", diff, diff, dtype=np.float64))
+            brenner_count += diff.size
+
+    pixels = max(gray.size, 1)
+    mean = gray_moments.mean
+    return {
+        "laplacian_var": laplacian.var,
+        "sobel_energy": sobel_sum,
+        "tenengrad": tenengrad_sum / pixels,
+        "brenner": brenner_sum / brenner_count if brenner_count else 0.0,
+        "normalized_variance": gray_moments.var / mean if mean else 0.0,
+    }
+
+
+@profiled
+def focus_metrics(image: np.ndarray, cache: bool = True) -> dict:
+    """
+    Compute every focus measure in FOCUS_METRICS from one grayscale conversion.
+
+    - laplacian_var: variance of the Laplacian
+    - sobel_energy: sum of Sobel gradient magnitudes
+    - tenengrad: mean squared Sobel gradient magnitude
+    - brenner: mean squared difference between pixels two columns apart
+    - normalized_variance: intensity variance divided by the mean intensity
+
+    Results are memoized by a hash of the grayscale plane, so asking again
+    for an unchanged image (e.g. the original on every UI rerun) is a lookup.
+    """
+    gray = to_gray(image)
+    key = _digest(gray) if cache else None
+    if key is not None and key in _metrics_cache:
+        _metrics_cache.move_to_end(key)
+        return dict(_metrics_cache[key])
+
+    metrics = _compute_metrics(gray)
+    if key is not None:
+        _metrics_cache[key] = metrics
+        if len(_metrics_cache) > METRICS_CACHE_SIZE:
+            _metrics_cache.popitem(last=False)
+    return dict(metrics)
+
+
+@profiled
 def variance_of_laplacian(image: np.ndarray) -> float:
     """
     Compute the variance of the Laplacian (focus measure).
     A higher value indicates a sharper image.
     """
-    # Ensure grayscale
-    if image.ndim == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    lap = cv2.Laplacian(gray, cv2.CV_64F)
-    return float(lap.var())
+    return focus_metrics(image)["laplacian_var"]
+
 
+@profiled
 def sobel_gradient_energy(image: np.ndarray) -> float:
     """
     Sum of Sobel gradient magnitudes across the image.
     """
-    if image.ndim == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    # Compute gradients
-    gx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    gy = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    # Sum of magnitudes
-    return float(np.sum(np.sqrt(gx**2 + gy**2)))
-
+    return focus_metrics(image)["sobel_energy"]
@@ -0,0 +1,221 @@
+"""
+Headless batch processing of whole directories.
+
+Example:
+    python batch_process.py "photos/**/*.jpg" -o out \\
+        --op denoise:method=median,ksize=5 --op sharpen:amount=1.5 --workers 8
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import utils
+from helpers.buffer_helpers import BufferPool
+from helpers.random_helpers import spawn_seed_sequences
+from operations import OPERATIONS, PRECISIONS, parse_operation, apply_operations
+from pipeline import run_pipeline
+
+
+def find_inputs(pattern):
+    """Expand an input glob (recursive '**' supported) into a sorted list of files"""
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def output_path_for(path, input_root, output_dir):
+    """Mirror the input path below output_dir, relative to the common input root"""
+    return os.path.join(output_dir, os.path.relpath(path, input_root))
+
+
+# Per worker process: consecutive images of the same size reuse its buffers.
+# The pool is keyed by exact shape, so it is emptied whenever the input size
+# changes instead of keeping idle buffers for every size seen.
+_pool = BufferPool()
+_pool_shape = None
+
+
+def _reset_pool_for(shape):
+    global _pool_shape
+    if shape != _pool_shape:
+        _pool.clear()
+        _pool_shape = shape
+
+
+def process_file(job):
+    """
+    Load, filter and save one image. Runs inside the worker processes.
+
+    Args:
+        job: (input_path, output_path, operations, seed, precision) tuple;
+            seed is a SeedSequence for the noise operations, or None
+
+    Returns:
+        (input_path, input_bytes, error) where error is None on success
+    """
+    path, out_path, operations, seed, precision = job
+    try:
+        size = os.path.getsize(path)
+        image = utils.load_image(path)
+        _reset_pool_for(image.shape)
+        rng = np.random.default_rng(seed) if seed is not None else None
+        result = apply_operations(image, operations, rng, _pool, precision)
+        try:
+            if not utils.save_image(result, out_path):
+                raise IOError(f"Could not write image: {out_path}")
+        finally:
+            _pool.release(result)
+        return path, size, None
+    except Exception as e:  # report and keep going with the rest of the batch
+        return path, 0, f"{type(e).__name__}: {e}"
+
+
+def input_root_for(paths):
+    """Deepest directory that contains every input path"""
+    if not paths:
+        return "."
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+
+
+def run_batch(paths, operations, output_dir, workers=None, chunksize=4, input_root=None, seed=None,
+              precision="uint8", executor=None):
+    """
+    Process paths across a process pool.
+
+    Outputs mirror the inputs relative to input_root (default: their common directory).
+    With a seed, every file gets its own child SeedSequence, so noise is
+    reproducible and independent across files regardless of which worker runs it.
+    precision is the working precision of apply_operations ('uint8', 'float32', 'float16').
+    executor is an already running ProcessPoolExecutor to submit the jobs to
+    (left running afterwards); by default one is started for this batch.
+
+    Returns:
+        Summary dict with images, failures, seconds, images_per_s, mb_per_s, errors
+    """
+    input_root = input_root or input_root_for(paths)
+    seeds = spawn_seed_sequences(seed, len(paths)) if seed is not None else [None] * len(paths)
+    jobs = [(path, output_path_for(os.path.abspath(path), input_root, output_dir), operations, child,
+             precision)
+            for path, child in zip(paths, seeds)]
+
+    processed, failures, total_bytes = 0, 0, 0
+    errors = []
+    start = time.perf_counter()
+
+    own_executor = None
+    if executor is not None:
+        results = executor.map(process_file, jobs, chunksize=chunksize)
+    elif workers == 1:
+        results = map(process_file, jobs)
+    else:
+        executor = own_executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(process_file, jobs, chunksize=chunksize)
+
+    try:
+        for path, size, error in results:
+            if error is None:
+                processed += 1
+                total_bytes += size
+            else:
+                failures += 1
+                errors.append((path, error))
+                print(f"Failed: {path} ({error})", file=sys.stderr)
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "images": processed,
+        "failures": failures,
+        "seconds": elapsed,
+        "images_per_s": processed / elapsed if elapsed > 0 else 0.0,
+        "mb_per_s": total_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+        "errors": errors,
+    }
+
+
+def run_batch_pipelined(paths, operations, output_dir, decode_threads=2, compute_threads=None,
+                        encode_threads=2, queue_size=8, seed=None, precision="uint8"):
+    """Process paths in-process through the overlapped decode/filter/encode pipeline"""
+    input_root = input_root_for(paths)
+    jobs = ((path, output_path_for(os.path.abspath(path), input_root, output_dir)) for path in paths)
+    summary = run_pipeline(jobs, operations, decode_threads, compute_threads, encode_threads,
+                           queue_size, seed, precision)
+    for path, error in summary["errors"]:
+        print(f"Failed: {path} ({error})", file=sys.stderr)
+    return summary
+
+
+def print_summary(summary):
+    """Print the throughput summary of a batch run"""
+    print("\n===== Batch Summary =====")
+    print(f"Processed : {summary['images']} images in {summary['seconds']:.2f} s")
+    print(f"Throughput: {summary['images_per_s']:.2f} images/s, {summary['mb_per_s']:.2f} MB/s")
+    print(f"Failures  : {summary['failures']}")
+    if "stages" in summary:
+        print("Stages    :")
+        for name, stats in summary["stages"].items():
+            print(f"  {name:<8} {stats['threads']:>2} threads, {stats['items']:>6} items, "
+                  f"{stats['utilization']:6.1%} busy")
+        print(f"Bottleneck: {summary['bottleneck']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Apply a chain of filters to many images without any UI.")
+    parser.add_argument("input", help="Input glob, e.g. 'images/*.jpg' or 'photos/**/*.png'")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the processed images")
+    parser.add_argument("--op", dest="operations", action="append", required=True,
+                        metavar="NAME[:key=value,...]",
+                        help=f"Operation to apply, repeat for a chain (in order). "
+                             f"Available: {', '.join(OPERATIONS)}")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes, or filter threads with --pipeline "
+                             "(default: CPU count, 1 = no pool)")
+    parser.add_argument("--chunksize", type=int, default=4, help="Files handed to a worker at a time")
+    parser.add_argument("--seed", type=int,
+                        help="Seed for the noise operations (each file gets an independent stream)")
+    parser.add_argument("--precision", choices=PRECISIONS, default="uint8",
+                        help="Working precision of the chain: uint8 rounds after every operation, "
+                             "float32/float16 keep the image in float and round once at the end "
+                             "(default: uint8)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap decode, filter and encode in thread stages instead of a process pool")
+    parser.add_argument("--decode-threads", type=int, default=2, help="Decoder threads (--pipeline)")
+    parser.add_argument("--encode-threads", type=int, default=2, help="Encoder threads (--pipeline)")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Images buffered between pipeline stages (--pipeline)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    paths = find_inputs(args.input)
+    if not paths:
+        print(f"No input files match: {args.input}", file=sys.stderr)
+        return 1
+
+    utils.ensure_dir_exists(args.output_dir)
+    if args.pipeline:
+        summary = run_batch_pipelined(paths, operations, args.output_dir, args.decode_threads,
+                                      args.workers, args.encode_threads, args.queue_size, args.seed,
+                                      args.precision)
+    else:
+        summary = run_batch(paths, operations, args.output_dir, args.workers, args.chunksize,
+                            seed=args.seed, precision=args.precision)
+    print_summary(summary)
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+Benchmark suite for every image operation.
+
+Runs each operation on deterministic synthetic images (grayscale and colour,
+0.3 MP up to 100 MP), times it with perf_counter after warm-up runs, checks
+the output against stored reference results and writes machine-readable JSON.
+A saved run can be used as a baseline to flag regressions. It also measures
+how long the entry points take to import (`python -X importtime`) against a
+budget, and that SciPy and matplotlib are not loaded until a filter needs them.
+
+Examples:
+    python benchmark.py                                   # default sizes, all operations
+    python benchmark.py --full -o results.json            # 0.3 MP .. 100 MP
+    python benchmark.py --ops edges,unsharp_mask --sizes 1,12 --repeat 10
+    python benchmark.py --compare baseline.json           # exit 1 on regressions
+    python benchmark.py --update-references               # after an intended output change
+    python benchmark.py --ops invert --sizes 0.3 --repeat 1   # mostly the import-time check
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from filters import (
+    apply_brightness, apply_grayscale, add_gaussian_noise, add_salt_pepper_noise,
+    apply_edge_detection, unsharp_mask, apply_channel_swap
+)
+from helpers import backend_helpers
+from helpers.noise_filter_helper import smooth_image_with_gaussian_blur, remove_noise_with_median_filter
+from InvertColorFilter import apply_invert
+from noiseRemovalFilter import remove_noise
+from Quantitative_Proof import focus_metrics
+
+DEFAULT_SIZES = (0.3, 1.0, 4.0)
+FULL_SIZES = (0.3, 1.0, 4.0, 12.0, 24.0, 50.0, 100.0)
+MODES = ("gray", "color")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REFERENCES_PATH = os.path.join(ROOT, "benchmarks", "references.json")
+
+# Cumulative import time budgets in seconds (numpy and OpenCV alone take
+# about 0.1 s); modules that must only be imported by the filters using them
+IMPORT_BUDGETS = {"filters": 0.4, "operations": 0.4, "main": 0.4}
+LAZY_MODULES = ("scipy", "matplotlib")
+
+# Output fingerprints must agree within these tolerances. Images must also
+# match the stored digest exactly; it is taken from a run on the reference
+# backends, so it does not depend on which backends calibration picked. The
+# timed output itself is compared with that run pixel by pixel; a threshold
+# (unsharp_mask) can flip the odd pixel whose value is within float rounding
+# of it, so a few pixels per million may differ by more.
+THUMBNAIL_SIZE = 8
+IMAGE_TOLERANCE = 1.0       # gray levels, per pixel and on the area-averaged thumbnail
+OUTLIER_FRACTION = 1e-5     # pixels allowed beyond IMAGE_TOLERANCE per pixel
+METRIC_TOLERANCE = 1e-4     # relative
+
+# name -> (function of the image, modes it supports)
+OPERATIONS = {
+    "brightness": (lambda img: apply_brightness(img, 2), MODES),
+    "grayscale": (apply_grayscale, ("color",)),
+    "gaussian_noise": (lambda img: add_gaussian_noise(img, 0.1, seed=0), MODES),
+    "salt_pepper": (lambda img: add_salt_pepper_noise(img, 0.1, seed=0), MODES),
+    "denoise_gaussian": (lambda img: smooth_image_with_gaussian_blur(img, 1.0), MODES),
+    "denoise_median": (lambda img: remove_noise_with_median_filter(img, 3), MODES),
+    "remove_noise_median": (lambda img: remove_noise(img, "median", ksize=5), MODES),
+    "remove_noise_gaussian": (lambda img: remove_noise(img, "gaussian", ksize=(5, 5), sigma=0), MODES),
+    "remove_noise_bilateral": (lambda img: remove_noise(img, "bilateral"), MODES),
+    "invert": (apply_invert, MODES),
+    "edges": (lambda img: apply_edge_detection(img, 1.0, "both"), ("color",)),
+    "unsharp_mask": (lambda img: unsharp_mask(img, (5, 5), 1.0, 1.5, 10), MODES),
+    "channel_swap": (lambda img: apply_channel_swap(img, "gbr"), ("color",)),
+    "focus_metrics": (lambda img: focus_metrics(img, cache=False), MODES),
+}
+
+
+def synthetic_image(megapixels, mode="color", seed=0):
+    """
+    Deterministic 4:3 test image: smooth structure, hard edges and fine noise,
+    so blurs, edge detectors and denoisers all have something to work on.
+    """
+    height = max(8, int(round((megapixels * 1e6 * 3 / 4) ** 0.5)))
+    width = max(8, int(round(megapixels * 1e6 / height)))
+    channels = 3 if mode == "color" else 1
+    rng = np.random.default_rng(seed)
+
+    coarse = rng.integers(0, 256, (48, 64, channels), dtype=np.uint8)
+    image = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    image = image.reshape(height, width, channels)
+    image[height // 4: height // 2, width // 4: width // 2] = 230  # a sharp-edged block
+    noise = rng.integers(-12, 13, image.shape, dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return image[..., 0] if channels == 1 else image
+
+
+def digest(result):
+    """sha256 of an output's shape, dtype and every pixel"""
+    result = np.ascontiguousarray(result)
+    h = hashlib.sha256(f"{result.shape}{result.dtype}".encode("ascii"))
+    h.update(result.data)
+    return h.hexdigest()
+
+
+@contextlib.contextmanager
+def reference_backends():
+    """Pin every dispatched operation to its reference backend for the block"""
+    previous = backend_helpers.pinned_backends()
+    for op in backend_helpers.DISPATCH_OPS:
+        backend_helpers.set_backend(op, backend_helpers.available_backends(op)[0])
+    try:
+        yield
+    finally:
+        for op in backend_helpers.DISPATCH_OPS:
+            backend_helpers.set_backend(op, previous.get(op))
+
+
+def fingerprint(result, reference_result=None):
+    """
+    Summary of an operation's output: an area-averaged thumbnail compared
+    with a tolerance, plus the exact digest of reference_result (the output
+    on the reference backends) when given.
+    """
+    if isinstance(result, dict):
+        return {"metrics": {key: float(value) for key, value in result.items()}}
+    result = np.asarray(result)
+    thumb = cv2.resize(result.astype(np.float32), (THUMBNAIL_SIZE, THUMBNAIL_SIZE),
+                       interpolation=cv2.INTER_AREA)
+    return {
+        "shape": list(result.shape),
+        "dtype": str(result.dtype),
+        "mean": float(result.mean()),
+        "thumbnail": np.round(thumb, 2).tolist(),
+        **({} if reference_result is None else {"digest": digest(reference_result)}),
+    }
+
+
+def pixel_diff(output, reference_output):
+    """
+    Compare the timed output with the reference-backend output per pixel.
+
+    Returns:
+        (ok, reason): ok if at most OUTLIER_FRACTION of the values differ by
+        more than IMAGE_TOLERANCE
+    """
+    if isinstance(output, dict):
+        return True, ""  # metrics, compared through the fingerprint
+    output, reference_output = np.asarray(output), np.asarray(reference_output)
+    if output.shape != reference_output.shape:
+        return False, f"shape {output.shape} != {reference_output.shape} on the reference backends"
+    diff = np.abs(output.astype(np.float32) - reference_output.astype(np.float32))
+    outliers = int(np.count_nonzero(diff > IMAGE_TOLERANCE))
+    if outliers > OUTLIER_FRACTION * diff.size:
+        return False, f"{outliers} pixels differ from the reference backends by up to {diff.max():g}"
+    return True, ""
+
+
+def matches(actual, expected):
+    """Compare two fingerprints; returns (ok, reason)"""
+    if "metrics" in expected:
+        for key, value in expected["metrics"].items():
+            got = actual.get("metrics", {}).get(key)
+            if got is None or abs(got - value) > METRIC_TOLERANCE * max(abs(value), 1.0):
+                return False, f"{key}: {got} != {value}"
+        return True, ""
+    if actual.get("shape") != expected["shape"] or actual.get("dtype") != expected["dtype"]:
+        return False, f"shape/dtype {actual.get('shape')} {actual.get('dtype')} != " \
+                      f"{expected['shape']} {expected['dtype']}"
+    diff = np.abs(np.array(actual["thumbnail"]) - np.array(expected["thumbnail"])).max()
+    if diff > IMAGE_TOLERANCE:
+        return False, f"thumbnail differs by {diff:.3f}"
+    if "digest" in expected and actual.get("digest") != expected["digest"]:
+        return False, "pixels differ from the reference output (digest)"
+    return True, ""
+
+
+def time_operation(func, image, warmup=1, repeat=5):
+    """Run func(image) warmup times untimed, then repeat timed runs; returns (times, last result)"""
+    result = None
+    for _ in range(warmup):
+        result = func(image)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(image)
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def case_key(name, megapixels, mode):
+    return f"{name}|{megapixels:g}MP|{mode}"
+
+
+def run_suite(ops=None, sizes=DEFAULT_SIZES, modes=MODES, warmup=1, repeat=5, references=None):
+    """
+    Time every (operation, size, mode) combination.
+
+    Returns:
+        List of result dicts: op, megapixels, mode, shape, times, min/median/
+        mean/stdev seconds, mp_per_s, fingerprint and reference status
+    """
+    ops = ops or list(OPERATIONS)
+    references = references or {}
+    results = []
+    for megapixels in sizes:
+        for mode in modes:
+            image = synthetic_image(megapixels, mode)
+            actual_mp = image.shape[0] * image.shape[1] / 1e6
+            for name in ops:
+                func, supported = OPERATIONS[name]
+                if mode not in supported:
+                    continue
+                times, output = time_operation(func, image, warmup, repeat)
+                key = case_key(name, megapixels, mode)
+                with reference_backends():
+                    reference_output = func(image)
+                output_print = fingerprint(output, reference_output)
+                same, reason = pixel_diff(output, reference_output)
+                del reference_output
+                if not same:
+                    reference = f"MISMATCH ({reason})"
+                elif key in references:
+                    ok, reason = matches(output_print, references[key])
+                    reference = "ok" if ok else f"MISMATCH ({reason})"
+                else:
+                    reference = "missing"
+                median = statistics.median(times)
+                entry = {
+                    "key": key,
+                    "op": name,
+                    "megapixels": megapixels,
+                    "mode": mode,
+                    "shape": list(image.shape),
+                    "times": times,
+                    "min_s": min(times),
+                    "median_s": median,
+                    "mean_s": statistics.fmean(times),
+                    "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+                    "mp_per_s": actual_mp / median if median > 0 else 0.0,
+                    "reference": reference,
+                    "fingerprint": output_print,
+                }
+                results.append(entry)
+                print(f"{key:<42} median {1000 * median:9.2f} ms  "
+                      f"({entry['mp_per_s']:7.1f} MP/s, ±{1000 * entry['stdev_s']:.2f} ms)  {reference}")
+            del image
+    return results
+
+
+def measure_import(module, runs=3):
+    """
+    Import module in fresh interpreters with -X importtime.
+
+    Returns:
+        (best cumulative seconds over the runs, set of top-level packages it loaded)
+    """
+    best, loaded = None, set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+        # Lines look like "import time:   self [us] | cumulative | name"
+        for line in proc.stderr.splitlines():
+            fields = [field.strip() for field in line.partition(":")[2].split("|")]
+            if len(fields) != 3 or not fields[1].isdigit():
+                continue
+            loaded.add(fields[2].split(".")[0])
+            if fields[2] == module:
+                seconds = int(fields[1]) / 1e6
+                best = seconds if best is None else min(best, seconds)
+    return best, loaded
+
+
+def run_imports(budgets=IMPORT_BUDGETS, runs=3):
+    """Check the import time of each entry point against its budget"""
+    entries = []
+    for module, budget in budgets.items():
+        seconds, loaded = measure_import(module, runs)
+        eager = sorted(name for name in LAZY_MODULES if name in loaded)
+        entry = {
+            "key": f"import|{module}",
+            "module": module,
+            "median_s": seconds,  # best of the runs; named like the operation results for compare()
+            "budget_s": budget,
+            "over_budget": seconds > budget,
+            "eager_imports": eager,
+        }
+        entries.append(entry)
+        status = "OVER BUDGET" if entry["over_budget"] else "ok"
+        if eager:
+            status += f", loads {', '.join(eager)} at import"
+        print(f"{entry['key']:<42} {1000 * seconds:9.2f} ms  (budget {1000 * budget:.0f} ms)  {status}")
+    return entries
+
+
+def environment():
+    """Machine and library versions, stored with every run"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Compare median times with a baseline run.
+
+    Returns:
+        (regressions, improvements): lists of (key, baseline_s, current_s, change)
+        where change is the relative difference of the medians
+    """
+    previous = {entry["key"]: entry for entry in baseline["results"] + baseline.get("imports", [])}
+    regressions, improvements = [], []
+    for entry in results:
+        old = previous.get(entry["key"])
+        if old is None or old["median_s"] <= 0:
+            continue
+        change = entry["median_s"] / old["median_s"] - 1.0
+        row = (entry["key"], old["median_s"], entry["median_s"], change)
+        if change > threshold:
+            regressions.append(row)
+        elif change < -threshold:
+            improvements.append(row)
+    return regressions, improvements
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(data, path, indent=1):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, sort_keys=indent is None)
+
+
+def _parse_list(text, cast=str):
+    return [cast(item.strip()) for item in text.split(",") if item.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark every image operation on synthetic images.")
+    parser.add_argument("--ops", help=f"Comma-separated operations (default: all of {', '.join(OPERATIONS)})")
+    parser.add_argument("--sizes", help="Comma-separated sizes in megapixels "
+                                        f"(default: {','.join(f'{s:g}' for s in DEFAULT_SIZES)})")
+    parser.add_argument("--full", action="store_true",
+                        help=f"Use all sizes: {','.join(f'{s:g}' for s in FULL_SIZES)} MP")
+    parser.add_argument("--modes", default=",".join(MODES), help="gray, color or both")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before timing")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("-o", "--output", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown of the median counted as a regression (default: 0.10)")
+    parser.add_argument("--references", default=REFERENCES_PATH, help="Reference results file")
+    parser.add_argument("--update-references", action="store_true",
+                        help="Store this run's outputs as the new references")
+    parser.add_argument("--skip-imports", action="store_true", help="Do not measure import times")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    ops = _parse_list(args.ops) if args.ops else None
+    unknown = [op for op in ops or [] if op not in OPERATIONS]
+    modes = _parse_list(args.modes)
+    if unknown or any(mode not in MODES for mode in modes):
+        print(f"Error: unknown operation or mode: {', '.join(unknown) or args.modes}", file=sys.stderr)
+        return 2
+    sizes = _parse_list(args.sizes, float) if args.sizes else (FULL_SIZES if args.full else DEFAULT_SIZES)
+
+    references = {}
+    if os.path.isfile(args.references) and not args.update_references:
+        references = load_json(args.references)
+
+    imports = [] if args.skip_imports else run_imports()
+    results = run_suite(ops, sizes, modes, args.warmup, args.repeat, references)
+    run = {"environment": environment(), "warmup": args.warmup, "repeat": args.repeat,
+           "imports": imports, "results": results}
+
+    if args.output:
+        save_json(run, args.output)
+        print(f"\nResults written to {args.output}")
+
+    if args.update_references:
+        stored = load_json(args.references) if os.path.isfile(args.references) else {}
+        stored.update({entry["key"]: entry["fingerprint"] for entry in results})
+        save_json(stored, args.references, indent=None)  # compact, it is only read back
+        print(f"References updated: {args.references}")
+
+    failed = False
+    mismatches = [entry["key"] for entry in results if entry["reference"].startswith("MISMATCH")]
+    if mismatches:
+        failed = True
+        print(f"\nOutput differs from the references for: {', '.join(mismatches)}")
+
+    slow_imports = [entry["key"] for entry in imports if entry["over_budget"] or entry["eager_imports"]]
+    if slow_imports:
+        failed = True
+        print(f"\nImport budget exceeded or heavy modules loaded eagerly: {', '.join(slow_imports)}")
+
+    if args.compare:
+        regressions, improvements = compare(imports + results, load_json(args.compare), args.threshold)
+        print(f"\n===== Comparison with {args.compare} =====")
+        for label, rows in (("Regressions", regressions), ("Improvements", improvements)):
+            print(f"{label}: {len(rows)}")
+            for key, old, new, change in rows:
+                print(f"  {key:<42} {1000 * old:9.2f} ms -> {1000 * new:9.2f} ms ({change:+.1%})")
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
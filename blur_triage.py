@@ -0,0 +1,125 @@
+"""
+Blur triage: score every image in a directory for sharpness and write a
+ranked CSV, blurriest first.
+
+Example:
+    python blur_triage.py "photos/**/*.jpg" -o focus.csv --threshold 100
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+from batch_process import find_inputs
+from Quantitative_Proof import FOCUS_METRICS, focus_metrics
+
+# Common rule of thumb for the variance of the Laplacian of 8-bit photos
+DEFAULT_THRESHOLD = 100.0
+
+
+def score_file(path):
+    """
+    Load one image and compute its focus metrics. Runs inside the worker processes.
+
+    Returns:
+        (path, row, error) where row holds width, height and the metrics
+    """
+    try:
+        image = utils.load_image(path)
+        row = {"width": image.shape[1], "height": image.shape[0]}
+        row.update(focus_metrics(image, cache=False))  # every file is seen once
+        return path, row, None
+    except Exception as e:  # report and keep going with the rest of the directory
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def score_files(paths, workers=None, chunksize=4):
+    """
+    Score paths across a process pool.
+
+    Returns:
+        (rows, errors): rows is a list of dicts with a 'path' key, in input order
+    """
+    rows, errors = [], []
+    if workers == 1:
+        results = map(score_file, paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(score_file, paths, chunksize=chunksize)
+
+    try:
+        for path, row, error in results:
+            if error is None:
+                rows.append({"path": path, **row})
+            else:
+                errors.append((path, error))
+                print(f"Failed: {path} ({error})", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return rows, errors
+
+
+def rank(rows, metric="laplacian_var", threshold=DEFAULT_THRESHOLD):
+    """Sort rows by metric (lowest = blurriest first) and flag those below threshold"""
+    ranked = sorted(rows, key=lambda row: row[metric])
+    for position, row in enumerate(ranked, 1):
+        row["rank"] = position
+        row["blurry"] = row[metric] < threshold
+    return ranked
+
+
+def write_csv(rows, path):
+    """Write ranked rows with a fixed column order"""
+    directory = os.path.dirname(path)
+    if directory:
+        utils.ensure_dir_exists(directory)
+    fields = ["rank", "path", "blurry", "width", "height", *FOCUS_METRICS]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Rank images by sharpness and flag blurry ones.")
+    parser.add_argument("input", help="Input glob, e.g. 'images/*.jpg' or 'photos/**/*.png'")
+    parser.add_argument("-o", "--output", default="focus_report.csv", help="CSV report path")
+    parser.add_argument("--metric", choices=FOCUS_METRICS, default="laplacian_var",
+                        help="Metric to rank and threshold by")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Images scoring below this are flagged as blurry")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--chunksize", type=int, default=4, help="Files handed to a worker at a time")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    paths = find_inputs(args.input)
+    if not paths:
+        print(f"No input files match: {args.input}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    rows, errors = score_files(paths, args.workers, args.chunksize)
+    ranked = rank(rows, args.metric, args.threshold)
+    write_csv(ranked, args.output)
+    elapsed = time.perf_counter() - start
+
+    blurry = sum(row["blurry"] for row in ranked)
+    print(f"Scored {len(ranked)} images in {elapsed:.2f} s, {blurry} below {args.metric} < "
+          f"{args.threshold:g}; report written to {args.output}")
+    if errors:
+        print(f"Failures: {len(errors)}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
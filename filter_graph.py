@@ -0,0 +1,299 @@
+"""
+Lazy filter graph.
+
+Operations from filters.py, noiseRemovalFilter.py, InvertColorFilter.py and
+Quantitative_Proof.py are recorded instead of executed. evaluate() then runs
+the graph with a few optimizations while returning exactly what the eager
+calls would:
+
+- adjacent point operations (brightness, invert, gamma, contrast) are
+  fused into one 256-entry lookup table and applied in a single pass
+- identical sub-graphs (e.g. the grayscale plane or the unsharp-mask blur
+  feeding several branches) are computed once
+- grayscale results are carried as one H×W plane instead of three identical
+  uint8 channels; the stack is only built for the final output
+
+Example:
+    gray = lazy(image).grayscale()
+    edges = gray.edges(1.5)
+    result, energy = evaluate(edges, gray.sobel_gradient_energy())
+"""
+import itertools
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from filters import (
+    apply_brightness, apply_gamma, apply_contrast, apply_grayscale, add_gaussian_noise, add_salt_pepper_noise, apply_channel_swap
+)
+from helpers.edge_helpers import detect_edges
+from helpers.lut_helpers import apply_lut, compile_point_ops
+from helpers.noise_filter_helper import smooth_image_with_gaussian_blur, remove_noise_with_median_filter
+from helpers.unsharp_mask_helpers import cached_gaussian_kernel, convolve2d, combine_unsharp
+from InvertColorFilter import apply_invert
+from noiseRemovalFilter import remove_noise
+from Quantitative_Proof import variance_of_laplacian, sobel_gradient_energy
+
+_IDENTITY = np.arange(256, dtype=np.uint8)
+_unique_ids = itertools.count()
+
+
+def _gray_lut(convert):
+    """What convert() does to a pixel whose three channels are all equal to v, for every v"""
+    triples = np.repeat(_IDENTITY, 3).reshape(1, 256, 3)
+    return np.ascontiguousarray(convert(triples)).reshape(256, -1)[:, 0].astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _regray_lut():
+    """Grayscale of an already gray image (not guaranteed to be the identity)"""
+    return _gray_lut(apply_grayscale)
+
+
+@lru_cache(maxsize=None)
+def _cv_gray_lut():
+    """cv2.cvtColor(BGR2GRAY) of a gray image, as used by the focus metrics"""
+    return _gray_lut(lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+
+class _Value:
+    """
+    An evaluated node. With gray3=True, data is a single H×W plane standing
+    for an H×W×3 image whose channels are identical.
+    """
+
+    def __init__(self, data, gray3=False):
+        self.data = data
+        self.gray3 = gray3
+
+    def image(self):
+        """Materialize the eager-equivalent array"""
+        if self.gray3:
+            return np.stack([self.data, self.data, self.data], axis=-1)
+        return self.data
+
+
+# Point operations: uint8 -> uint8 maps applied value by value. uint8 data
+# goes through the lookup-table engine, anything else through these.
+_POINT_OPS = {
+    "brightness": apply_brightness,
+    "invert": apply_invert,
+    "gamma": apply_gamma,
+    "contrast": apply_contrast,
+}
+
+# Operations that treat channels independently and identically, so a gray3
+# value can be processed as its single plane
+_PLANE_SAFE_OPS = {
+    "unsharp_blur", "unsharp_combine", "gaussian_blur", "median_filter", "salt_pepper",
+}
+
+# Operations that draw random numbers must never be shared between branches
+_RANDOM_OPS = {"gaussian_noise", "salt_pepper"}
+
+
+class LazyImage:
+    """A recorded (not yet executed) image operation. Build with lazy(image)."""
+
+    def __init__(self, op, params=None, inputs=(), source=None):
+        self.op = op
+        self.params = params or {}
+        self.inputs = tuple(inputs)
+        self.source = source
+        if op == "source":
+            self.key = ("source", id(source))
+        else:
+            extra = (next(_unique_ids),) if op in _RANDOM_OPS else ()
+            self.key = (op, repr(sorted(self.params.items())),
+                        tuple(node.key for node in self.inputs)) + extra
+
+    def _then(self, op, **params):
+        return LazyImage(op, params, (self,))
+
+    # --- filters.py ---
+    def brightness(self, level=0):
+        return self._then("brightness", level=level)
+
+    def gamma(self, gamma=1.0):
+        return self._then("gamma", gamma=gamma)
+
+    def contrast(self, alpha=1.0, beta=0.0):
+        return self._then("contrast", alpha=alpha, beta=beta)
+
+    def grayscale(self):
+        return self._then("grayscale")
+
+    def gaussian_noise(self, intensity=0.1, seed=None):
+        return self._then("gaussian_noise", intensity=intensity, seed=seed)
+
+    def salt_pepper(self, intensity=0.1, seed=None):
+        return self._then("salt_pepper", intensity=intensity, seed=seed)
+
+    def edges(self, sensitivity=1.0, direction='both'):
+        return self._then("edges", sensitivity=sensitivity, direction=direction)
+
+    def unsharp_mask(self, ksize=(5, 5), sigma=1.0, amount=1.0, threshold=0):
+        # Split so that branches with the same blur but different amounts share it
+        blurred = self._then("unsharp_blur", ksize=tuple(ksize), sigma=sigma)
+        return LazyImage("unsharp_combine", {"amount": amount, "threshold": threshold}, (self, blurred))
+
+    def channel_swap(self, mode='rgb'):
+        return self._then("channel_swap", mode=mode)
+
+    # --- helpers/noise_filter_helper.py, noiseRemovalFilter.py, InvertColorFilter.py ---
+    def gaussian_blur(self, sigma=1.0):
+        return self._then("gaussian_blur", sigma=sigma)
+
+    def median_filter(self, kernel_size=3):
+        return self._then("median_filter", kernel_size=kernel_size)
+
+    def remove_noise(self, method="median", **kwargs):
+        return self._then("remove_noise", method=method, **kwargs)
+
+    def invert(self):
+        return self._then("invert")
+
+    # --- Quantitative_Proof.py (scalar results) ---
+    def variance_of_laplacian(self):
+        return self._then("variance_of_laplacian")
+
+    def sobel_gradient_energy(self):
+        return self._then("sobel_gradient_energy")
+
+    def compute(self):
+        """Evaluate this node (see evaluate() to compute several nodes together)"""
+        return evaluate(self)[0]
+
+
+def lazy(image):
+    """Start a lazy filter graph from an eager image"""
+    return LazyImage("source", source=image)
+
+
+def _consumer_counts(outputs):
+    """How many nodes consume each key, for fusion decisions and early release"""
+    counts, seen, stack = {}, set(), list(outputs)
+    while stack:
+        node = stack.pop()
+        if node.key in seen:
+            continue
+        seen.add(node.key)
+        for parent in node.inputs:
+            counts[parent.key] = counts.get(parent.key, 0) + 1
+            stack.append(parent)
+    return counts
+
+
+def _run_op(node, values):
+    """Execute one node given its evaluated inputs"""
+    op, params = node.op, node.params
+    value = values[0]
+
+    if op == "grayscale":
+        if value.gray3:
+            return _Value(_regray_lut()[value.data], gray3=True)
+        return _Value(apply_grayscale(value.data, channels=1), gray3=True)
+
+    if op == "edges":
+        data = value.data
+        if value.gray3:
+            data = _regray_lut()[data]
+        elif data.ndim == 3:
+            data = apply_grayscale(data, channels=1)
+        return _Value(detect_edges(data, params["sensitivity"], params["direction"]), gray3=True)
+
+    if op in ("variance_of_laplacian", "sobel_gradient_energy"):
+        metric = variance_of_laplacian if op == "variance_of_laplacian" else sobel_gradient_energy
+        data = _cv_gray_lut()[value.data] if value.gray3 else value.data
+        return _Value(metric(data))
+
+    if op == "channel_swap" and value.gray3 and params["mode"] in ("rgb", "rbg", "grb", "gbr", "brg", "bgr"):
+        return _Value(value.data.copy(), gray3=True)  # permuting identical channels
+
+    plane = value.gray3 and op in _PLANE_SAFE_OPS
+    data = value.data if plane else value.image()
+
+    if op == "unsharp_blur":
+        kernel = cached_gaussian_kernel(params["ksize"][0], params["sigma"])
+        result = convolve2d(data.astype(np.float32), kernel)
+    elif op == "unsharp_combine":
+        # The blur was evaluated from the same input, so it has the same layout
+        result = combine_unsharp(data.astype(np.float32), values[1].data,
+                                 params["amount"], params["threshold"])
+    elif op == "gaussian_blur":
+        result = smooth_image_with_gaussian_blur(data, params["sigma"])
+    elif op == "median_filter":
+        result = remove_noise_with_median_filter(data, params["kernel_size"])
+    elif op == "salt_pepper":
+        result = add_salt_pepper_noise(data, params["intensity"], params["seed"])
+    elif op == "gaussian_noise":
+        result = add_gaussian_noise(data, params["intensity"], params["seed"])
+    elif op == "channel_swap":
+        result = apply_channel_swap(data, params["mode"])
+    elif op == "remove_noise":
+        kwargs = dict(params)
+        result = remove_noise(data, kwargs.pop("method"), **kwargs)
+    else:
+        raise ValueError(f"Unknown operation: {op}")
+    return _Value(result, gray3=plane)
+
+
+def evaluate(*outputs):
+    """
+    Evaluate one or more lazy nodes, sharing common work between them.
+
+    Returns:
+        List with one result per node (arrays for images, floats for metrics)
+    """
+    counts = _consumer_counts(outputs)
+    wanted = {node.key for node in outputs}
+    cache = {}
+
+    def release(node):
+        # Drop an intermediate once its last consumer has run
+        counts[node.key] -= 1
+        if counts[node.key] == 0 and node.key not in wanted:
+            cache.pop(node.key, None)
+
+    def fusable(node):
+        return (node.op in _POINT_OPS and node.key not in cache
+                and node.key not in wanted and counts.get(node.key, 0) == 1)
+
+    def run(node):
+        if node.key in cache:
+            return cache[node.key]
+
+        if node.op == "source":
+            value = _Value(node.source)
+        elif node.op in _POINT_OPS:
+            # Walk up the chain of point ops nobody else needs and fuse them
+            chain = [node]
+            while fusable(chain[-1].inputs[0]):
+                chain.append(chain[-1].inputs[0])
+            base = chain[-1].inputs[0]
+            start = run(base)
+            if start.data.dtype == np.uint8:
+                lut = compile_point_ops([(step.op, step.params) for step in reversed(chain)])
+                value = _Value(apply_lut(start.data, lut), start.gray3)
+            else:
+                value = start
+                for step in reversed(chain):
+                    value = _Value(_POINT_OPS[step.op](value.data, **step.params), value.gray3)
+            release(base)
+            for step in chain[:-1]:
+                release(step.inputs[0])
+        else:
+            inputs = [run(parent) for parent in node.inputs]
+            value = _run_op(node, inputs)
+            for parent in node.inputs:
+                release(parent)
+
+        cache[node.key] = value
+        return value
+
+    results = []
+    for node in outputs:
+        value = run(node)
+        results.append(value.image() if isinstance(value.data, np.ndarray) else value.data)
+    return results
@@ -0,0 +1,368 @@
+"""
+Local HTTP service for the filter operations.
+
+A long-running asyncio server, so OpenCV/SciPy are imported once and every
+request skips interpreter start-up. CPU work runs in a thread pool (OpenCV
+and NumPy release the GIL) or, with --processes, a process pool.
+
+Requests with the same operation chain and output format that arrive within
+--batch-window milliseconds are handed to the pool as one micro-batch, run
+grouped by image size so kernel and FFT caches are reused back to back.
+Once --max-queue requests are admitted and unfinished, new ones get
+503 Service Unavailable instead of piling up.
+
+Endpoints:
+    POST /process?ops=<JSON chain>&format=png   body: encoded image bytes
+         (the chain may also be sent in an X-Operations header)
+    GET  /metrics                              latency histograms, counters
+    GET  /metrics?format=prometheus            per-operation profile (with --profile)
+    GET  /health
+
+Example:
+    python filter_server.py --port 8080 --workers 4
+    curl -s --data-binary @images/delft.jpg -o out.png \\
+        'http://127.0.0.1:8080/process?ops=["denoise","sharpen:amount=1.5"]'
+"""
+import argparse
+import asyncio
+import bisect
+import ipaddress
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from helpers import profiling
+from operations import apply_operations, operations_from_json
+
+OUTPUT_FORMATS = {"png": ".png", "jpg": ".jpg", "jpeg": ".jpg", "webp": ".webp"}
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".webp": "image/webp"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count, sum and bucket-based percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        if not self.count:
+            return 0.0
+        target, seen = fraction * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        labels = [f"le_{bound:g}" for bound in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def process_batch(payloads, operations, ext):
+    """
+    Decode, filter and encode a micro-batch. Runs in the worker pool.
+
+    Returns:
+        One (status, body) pair per payload, in order
+    """
+    decoded = []
+    for index, data in enumerate(payloads):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        decoded.append((index, image))
+
+    results = [None] * len(payloads)
+    # Same-size images back to back, so size-keyed kernel/FFT caches stay warm
+    decoded.sort(key=lambda item: item[1].shape if item[1] is not None else ())
+    for index, image in decoded:
+        if image is None:
+            results[index] = (400, b"Could not decode image")
+            continue
+        try:
+            result = np.ascontiguousarray(apply_operations(image, operations))
+            ok, encoded = cv2.imencode(ext, result)
+            if not ok:
+                raise IOError(f"Could not encode result as {ext}")
+            results[index] = (200, encoded.tobytes())
+        except (ValueError, TypeError) as e:  # bad parameters for this image
+            results[index] = (400, f"{type(e).__name__}: {e}".encode("utf-8"))
+        except Exception as e:
+            results[index] = (500, f"{type(e).__name__}: {e}".encode("utf-8"))
+    return results
+
+
+class _Batch:
+    """Requests waiting to be sent to the pool together"""
+
+    def __init__(self, operations):
+        self.operations = operations
+        self.payloads = []
+        self.futures = []
+        self.timer = None
+
+
+class FilterService:
+    """Admission control, micro-batching and metrics around the worker pool"""
+
+    def __init__(self, executor, max_queue=64, batch_window=0.005, max_batch=8):
+        self.executor = executor
+        self.max_queue = max_queue
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.in_flight = 0
+        self.batches = {}
+        self.latency = LatencyHistogram()
+        self.compute = LatencyHistogram()
+        self.counters = {"requests": 0, "shed": 0, "errors": 0, "batches": 0, "batched_images": 0}
+
+    def metrics(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_queue": self.max_queue,
+            "counters": dict(self.counters),
+            "mean_batch_size": (self.counters["batched_images"] / self.counters["batches"]
+                                if self.counters["batches"] else 0.0),
+            "request_latency": self.latency.as_dict(),
+            "batch_compute": self.compute.as_dict(),
+        }
+
+    def admit(self):
+        """Reserve a queue slot, or return False when the service is saturated"""
+        if self.in_flight >= self.max_queue:
+            self.counters["shed"] += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    async def submit(self, data, operations, ext):
+        """Queue one image for the next batch with the same chain and format"""
+        key = (json.dumps(operations, sort_keys=True, default=repr), ext)
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = self.batches[key] = _Batch(operations)
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.batch_window, self._flush, key)
+        future = asyncio.get_running_loop().create_future()
+        batch.payloads.append(data)
+        batch.futures.append(future)
+        if len(batch.payloads) >= self.max_batch:
+            batch.timer.cancel()
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        batch = self.batches.pop(key, None)
+        if batch is not None:
+            asyncio.ensure_future(self._run(batch, key[1]))
+
+    async def _run(self, batch, ext):
+        self.counters["batches"] += 1
+        self.counters["batched_images"] += len(batch.payloads)
+        start = time.perf_counter()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, process_batch, batch.payloads, batch.operations, ext)
+        except Exception as e:  # e.g. a crashed worker process
+            results = [(500, f"{type(e).__name__}: {e}".encode("utf-8"))] * len(batch.futures)
+        self.compute.observe(time.perf_counter() - start)
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _response(writer, status, body=b"", content_type="text/plain; charset=utf-8", extra=None):
+    headers = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+               f"Content-Type: {content_type}", f"Content-Length: {len(body)}"]
+    headers += [f"{name}: {value}" for name, value in (extra or {}).items()]
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+
+
+def _json_response(writer, status, payload):
+    _response(writer, status, json.dumps(payload).encode("utf-8"), "application/json")
+
+
+async def _read_request(reader, max_body):
+    """Parse one HTTP/1.1 request; returns None on a closed connection"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > max_body:
+        return method, target, headers, None
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+async def _handle_process(service, writer, target, headers, body):
+    query = parse_qs(urlsplit(target).query)
+    try:
+        chain_text = query.get("ops", [headers.get("x-operations", "")])[0]
+        operations = operations_from_json(json.loads(chain_text))
+        fmt = query.get("format", ["png"])[0].lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown format: {fmt} (available: {', '.join(OUTPUT_FORMATS)})")
+        if not body:
+            raise ValueError("Request body must contain the image bytes")
+    except ValueError as e:  # includes JSON decode errors
+        service.counters["errors"] += 1
+        return _response(writer, 400, str(e).encode("utf-8"))
+
+    if not service.admit():
+        return _response(writer, 503, b"Server busy, retry later", extra={"Retry-After": "1"})
+    try:
+        ext = OUTPUT_FORMATS[fmt]
+        status, payload = await service.submit(body, operations, ext)
+    finally:
+        service.release()
+    if status != 200:
+        service.counters["errors"] += 1
+        return _response(writer, status, payload)
+    _response(writer, 200, payload, CONTENT_TYPES[ext])
+
+
+def make_handler(service, max_body):
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader, max_body)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                service.counters["requests"] += 1
+                path = urlsplit(target).path
+                if body is None:
+                    _response(writer, 413, b"Image too large", extra={"Connection": "close"})
+                    await writer.drain()
+                    break
+                if path == "/process":
+                    if method != "POST":
+                        _response(writer, 405, b"Use POST")
+                    else:
+                        await _handle_process(service, writer, target, headers, body)
+                elif path == "/metrics" and method == "GET":
+                    if parse_qs(urlsplit(target).query).get("format") == ["prometheus"]:
+                        _response(writer, 200, profiling.prometheus_text().encode("utf-8"),
+                                  "text/plain; version=0.0.4")
+                    else:
+                        _json_response(writer, 200, service.metrics())
+                elif path == "/health" and method == "GET":
+                    _json_response(writer, 200, {"status": "ok"})
+                else:
+                    _response(writer, 404, b"Not found")
+                await writer.drain()
+                if path == "/process":
+                    service.latency.observe(time.perf_counter() - start)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent garbage
+        finally:
+            writer.close()
+    return handle
+
+
+def check_local(host):
+    """Refuse to bind anywhere but the loopback interface"""
+    if host == "localhost":
+        return
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"The filter service only binds to loopback addresses, got {host}")
+
+
+async def serve(host="127.0.0.1", port=8080, workers=None, processes=False, max_queue=64,
+                batch_window=0.005, max_batch=8, max_body_mb=64):
+    """Run the service until cancelled"""
+    check_local(host)
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool(max_workers=workers) as executor:
+        service = FilterService(executor, max_queue, batch_window, max_batch)
+        server = await asyncio.start_server(make_handler(service, max_body_mb * 1024 * 1024),
+                                            host, port)
+        kind = "processes" if processes else "threads"
+        print(f"Serving filters on http://{host}:{port} ({workers} worker {kind})")
+        async with server:
+            await server.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve the filter operations over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Loopback address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Worker threads or processes (default: CPU count)")
+    parser.add_argument("--processes", action="store_true",
+                        help="Use a process pool instead of threads")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="Requests admitted at once before answering 503")
+    parser.add_argument("--batch-window", type=float, default=5.0,
+                        help="Milliseconds to wait for requests to batch together")
+    parser.add_argument("--max-batch", type=int, default=8, help="Images per micro-batch")
+    parser.add_argument("--max-body-mb", type=int, default=64, help="Largest accepted upload")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-operation timings (thread pool only), "
+                             "served at /metrics?format=prometheus")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.processes, args.max_queue,
+                          args.batch_window / 1000.0, args.max_batch, args.max_body_mb))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("Stopping server...")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
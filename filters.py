@@ -1,35 +1,121 @@
 import numpy as np
 from helpers.brightness_helpers import get_brightness_factor
-from helpers.edge_helpers import get_sobel_kernels, apply_convolution, normalize_edges
+from helpers.edge_helpers import detect_edges
 import cv2
-from helpers.unsharp_mask_helpers import gaussian_kernel, convolve2d
+from helpers.unsharp_mask_helpers import combine_unsharp
+from helpers.sharpener_helpers import Sharpener
+from helpers.backend_helpers import dispatch
 from helpers.gaussian_noise_helpers import add_gaussian_noise
 from helpers.salt_pepper_noise_helpers import add_salt_pepper_noise
 from helpers.channel_swap_helpers import apply_channel_swap
+from helpers.color_matrix_helpers import apply_color_matrix, apply_sepia, grayscale_plane
+from helpers.lut_helpers import (
+    apply_lut, brightness_lut, brightness_levels_table, gamma_lut, contrast_lut, compile_point_ops
+)
+from helpers.fft_helpers import (
+    apply_frequency_filter, ideal_lowpass, butterworth_lowpass,
+    ideal_highpass, butterworth_highpass, notch_filter
+)
+from helpers.buffer_helpers import BufferPool, resolve_out, write_out
+from helpers.profiling import profiled
 
-def apply_brightness(image, level=0):
-    """Apply brightness adjustment with specified level"""
+@profiled
+def apply_brightness(image, level=0, out=None):
+    """
+    Apply brightness adjustment with specified level
+
+    out (here and in the other filters): optional destination array or
+    BufferPool to write the result to; it may be the image itself.
+    """
+    if image.dtype == np.uint8:
+        # Same values as the float formula below, in one table lookup pass
+        return apply_lut(image, brightness_lut(level), out)
     factor = get_brightness_factor(level)
-    return np.clip(image * factor, 0, 255).astype(np.uint8)
+    return write_out(np.clip(image * factor, 0, 255), out, np.uint8)
+
+@profiled
+def apply_gamma(image, gamma=1.0, out=None):
+    """Apply gamma correction to a uint8 image (gamma > 1 brightens, < 1 darkens)"""
+    return apply_lut(image, gamma_lut(gamma), out)
+
+@profiled
+def apply_contrast(image, alpha=1.0, beta=0.0, out=None):
+    """Stretch contrast around mid-gray by alpha and shift by beta (uint8 image)"""
+    return apply_lut(image, contrast_lut(alpha, beta), out)
+
+@profiled
+def apply_point_ops(image, operations, out=None):
+    """
+    Apply several point operations to a uint8 image in a single pass.
+
+    operations: ordered (name, params) pairs, names from
+        'brightness', 'invert', 'gamma', 'contrast'
+    """
+    return apply_lut(image, compile_point_ops(operations), out)
+
+# Every level except 0 (the original image)
+BRIGHTNESS_LEVELS = (-4, -3, -2, -1, 1, 2, 3, 4)
+
+def iter_brightness_levels(image, levels=BRIGHTNESS_LEVELS, out=None):
+    """
+    Yield (level, image) for each brightness level as soon as it is computed,
+    so callers can save or show one level at a time instead of holding all of them.
+
+    With an out array every level is written to it, overwriting the previous
+    one, so consume each level before advancing; with a BufferPool every
+    level gets its own pooled buffer.
+    """
+    if image.dtype != np.uint8:
+        for level in levels:
+            yield level, apply_brightness(image, level, out)
+        return
+    table = brightness_levels_table(tuple(levels))  # one shared table for all levels
+    for level, lut in zip(levels, table):
+        yield level, apply_lut(image, lut, out)
 
+@profiled
 def apply_all_brightness_levels(image):
     """Apply all brightness levels and return a dictionary of results"""
-    results = {}
-    for level in range(-4, 5):
-        if level == 0:  # Skip original image
-            continue
-        results[level] = apply_brightness(image, level)
-    return results
-
-def apply_grayscale(image):
-    """Convert an image to grayscale using perceptual weights"""
-    weights = np.array([0.299, 0.587, 0.114])
-    grayscale = np.dot(image[..., :3], weights)
-    return np.stack([grayscale, grayscale, grayscale], axis=-1).astype(np.uint8)
-
-def unsharp_mask(image, ksize=(5,5), sigma=1.0, amount=1.0, threshold=0):
+    return dict(iter_brightness_levels(image))
+
+@profiled
+def apply_grayscale(image, channels=3, out=None):
+    """
+    Convert an image to grayscale using perceptual weights
+
+    channels=1 returns the H×W plane; channels=3 returns a read-only
+    3-channel view of that plane (no copies of identical channels), or
+    fills every channel of out when one is given.
     """
-    Manual unsharp masking (no OpenCV).
+    if out is not None:
+        dest = resolve_out(out, image.shape[:2] + ((channels,) if channels != 1 else ()), np.uint8)
+        plane = dest if channels == 1 else dest[..., 0]
+        # The plane is complete before it is written, so out may be the image itself
+        if image.dtype != np.uint8:
+            write_out(np.dot(image[..., :3], [0.299, 0.587, 0.114]), plane, np.uint8)
+        else:
+            grayscale_plane(image, out=plane)
+        for c in range(1, channels):
+            dest[..., c] = plane
+        return dest
+
+    if image.dtype != np.uint8:
+        weights = np.array([0.299, 0.587, 0.114])
+        grayscale = np.dot(image[..., :3], weights).astype(np.uint8)
+    else:
+        # Integer fixed-point weights
+        grayscale = grayscale_plane(image)
+    if channels == 1:
+        return grayscale
+    return np.broadcast_to(grayscale[..., None], grayscale.shape + (channels,))
+
+@profiled
+def unsharp_mask(image, ksize=(5,5), sigma=1.0, amount=1.0, threshold=0, out=None):
+    """
+    Unsharp masking; the Gaussian blur runs on the fastest backend
+    calibrated for this machine (see helpers.backend_helpers). To try several
+    amounts or thresholds on one image, Sharpener(image).sharpen(...) gives
+    the same result and blurs only once.
 
     Parameters:
         image (ndarray): Input H×W or H×W×C uint8 image.
@@ -37,32 +123,30 @@ def unsharp_mask(image, ksize=(5,5), sigma=1.0, amount=1.0, threshold=0):
         sigma (float): Gaussian sigma.
         amount (float): Strength of sharpening (>0).
         threshold (int): Minimum difference to sharpen (optional).
+        out (ndarray or BufferPool): Optional destination, may be image.
 
     Returns:
         sharpened (ndarray): uint8 sharpened image.
     """
-    # 1) Build kernel & blur
-    kh, kw = ksize
-    kernel = gaussian_kernel(kh, sigma)
-    img_float = image.astype(np.float32)
-    blurred = convolve2d(img_float, kernel)
+    # With a pool, the float32 working buffers come from it as well
+    pool = out if isinstance(out, BufferPool) else None
 
-    # 2) Mask = original - blurred
-    mask = img_float - blurred
-
-    # 3) Optionally zero out small differences
-    if threshold > 0:
-        low_contrast = np.abs(mask) < threshold
-        mask[low_contrast] = 0
-
-    # 4) Add scaled mask back
-    sharpened = img_float + amount * mask
+    # 1) Blur with a kh × kh Gaussian, mirroring the border without
+    #    repeating the edge pixel (as the original convolve2d path did)
+    kh, kw = ksize
+    img_float = resolve_out(pool, image.shape, np.float32)
+    np.copyto(img_float, image)
+    blurred = dispatch("gaussian", img_float, sigma, kh, mode="mirror", out=pool)
 
-    # 5) Clip and convert back
-    sharpened = np.clip(sharpened, 0, 255).astype(np.uint8)
-    return sharpened
+    # 2) Combine original and blur into the sharpened image
+    result = combine_unsharp(img_float, blurred, amount, threshold, out)
+    if pool is not None:
+        pool.release(img_float)
+        pool.release(blurred)
+    return result
 
-def apply_edge_detection(image, sensitivity=1.0, direction='both'):# 0.1 => 2.0
+@profiled
+def apply_edge_detection(image, sensitivity=1.0, direction='both', channels=3, out=None):# 0.1 => 2.0
     """
     Apply Sobel edge detection to the image
     
@@ -70,30 +154,27 @@ def apply_edge_detection(image, sensitivity=1.0, direction='both'):# 0.1 => 2.0
         image: Input image (will be converted to grayscale if color)
         sensitivity: Edge detection sensitivity (default: 1.0)
         direction: Edge detection direction ('horizontal', 'vertical', or 'both')
+        channels: 3 for a (read-only) 3-channel view of the edges, 1 for the plane
+        out: Optional destination array (filled on every channel) or BufferPool
     
     Returns:
-        Edge detected image
+        Edge detected image (within 1 gray level of the original float64 path)
     """
     # Convert to grayscale if color image
     if len(image.shape) == 3:
-        image = apply_grayscale(image)[..., 0]  # Take one channel since it's grayscale
-    
-    # Get Sobel kernels
-    sobel_x, sobel_y = get_sobel_kernels()
-    
-    # Apply edge detection based on direction
-    if direction == 'horizontal':
-        edges = apply_convolution(image, sobel_x)
-    elif direction == 'vertical':
-        edges = apply_convolution(image, sobel_y)
-    else:  # both
-        edges_x = apply_convolution(image, sobel_x)
-        edges_y = apply_convolution(image, sobel_y)
-        # Calculate magnitude of gradient
-        edges = np.sqrt(edges_x**2 + edges_y**2)
-        
-    # Normalize and apply sensitivity
-    edges = normalize_edges(edges, sensitivity)
+        image = apply_grayscale(image, channels=1)
     
+    if out is not None:
+        dest = resolve_out(out, image.shape[:2] + ((channels,) if channels != 1 else ()), np.uint8)
+        plane = dest if channels == 1 else dest[..., 0]
+        detect_edges(image, sensitivity, direction, out=plane)
+        for c in range(1, channels):
+            dest[..., c] = plane
+        return dest
+
+    edges = detect_edges(image, sensitivity, direction)
+    if channels == 1:
+        return edges
+
     # Convert back to 3-channel image
-    return np.stack([edges, edges, edges], axis=-1)
\ No newline at end of file
+    return np.broadcast_to(edges[..., None], edges.shape + (channels,))
\ No newline at end of file
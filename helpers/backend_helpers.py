@@ -0,0 +1,464 @@
+"""
+Backend dispatch for operations that have several implementations.
+
+Gaussian smoothing, median filtering and 2D convolution can each run on
+OpenCV, SciPy or plain NumPy (plus FFT for convolution). Which one is fastest
+depends on the machine, the dtype, the kernel size and the image size, so the
+first call for a new (operation, dtype, channels, kernel size, size bucket)
+combination runs a short calibration on a crop of the image and remembers
+the winner. Choices are kept in a per-machine JSON cache so later runs skip
+the calibration.
+
+Every backend computes the same thing (same kernel, same borders, uint8
+results rounded once). During calibration each backend's output is
+compared with the reference backend (the first one registered) and backends
+that disagree by more than the tolerance are never chosen.
+
+    from helpers import backend_helpers
+    backend_helpers.set_backend("median", "scipy")     # pin
+    backend_helpers.set_backend("median", None)        # back to automatic
+
+ENHANCER_BACKEND pins backends from the environment, either one name for all
+operations ('opencv') or per operation ('gaussian=opencv,median=scipy').
+ENHANCER_BACKEND_CACHE sets the cache file; an empty value keeps the
+calibration in memory only.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from helpers.buffer_helpers import opencv_dst, resolve_out, write_out
+from helpers.fft_helpers import fft_convolve
+from helpers.temporal_denoise_helpers import MEDIAN_NETWORK_MAX, median_of_frames
+from helpers.unsharp_mask_helpers import (
+    convolve_separable, convolve_windowed, gaussian_kernel_1d, separable_factors
+)
+
+DISPATCH_OPS = ("gaussian", "median", "convolve")
+
+# Calibration runs on a crop of at most this many pixels, timing each
+# backend CALIBRATION_REPEAT times after one untimed run
+CALIBRATION_PIXELS = 1 << 20
+CALIBRATION_REPEAT = 3
+
+# Largest difference from the reference backend that still counts as equivalent
+UINT8_TOLERANCE = 1         # gray levels
+FLOAT_TOLERANCE = 1e-3      # relative to the largest reference value (at least 1)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "enhancer", "backends.json")
+
+# op -> {backend name: (function, supports(image, *args) -> bool)}, in registration order
+_backends = {op: {} for op in DISPATCH_OPS}
+_choices = {}
+_pins = {}
+_loaded = False
+_lock = threading.RLock()
+
+
+def register_backend(op, name, supports=None):
+    """Decorator adding an implementation of op; the first one registered is the reference"""
+    def decorator(func):
+        _backends[op][name] = (func, supports or (lambda image, *args, **kwargs: True))
+        return func
+    return decorator
+
+
+def available_backends(op):
+    """Names of the backends registered for op, reference first"""
+    _check_op(op)
+    return list(_backends[op])
+
+
+def _check_op(op):
+    if op not in _backends:
+        raise ValueError(f"Unknown dispatch operation: {op} (available: {', '.join(DISPATCH_OPS)})")
+
+
+def _to_output(values, dtype, out=None):
+    """
+    uint8 input gives rounded, saturated uint8 output; everything else float32.
+    values is a temporary of the backend and is rounded in place.
+    """
+    if dtype == np.uint8:
+        np.rint(values, out=values)
+        np.clip(values, 0, 255, out=values)
+        return write_out(values, out, np.uint8)
+    return write_out(values, out, np.float32)
+
+
+def _channels(image):
+    return image.shape[2] if image.ndim == 3 else 1
+
+
+# ---- gaussian(image, sigma, ksize=None, mode='reflect') ----------------------
+# Same result as scipy.ndimage.gaussian_filter: a kernel of radius
+# int(4 * sigma + 0.5), or ksize // 2 when ksize is given. mode is scipy's
+# border mode: 'reflect' repeats the edge pixel (d c b a | a b c d), 'mirror'
+# does not (d c b | a b c d), like numpy's 'reflect' padding.
+
+# scipy border mode -> (numpy pad mode, OpenCV border type)
+GAUSSIAN_MODES = {
+    "reflect": ("symmetric", cv2.BORDER_REFLECT),
+    "mirror": ("reflect", cv2.BORDER_REFLECT_101),
+}
+
+
+def gaussian_radius(sigma, ksize=None):
+    return ksize // 2 if ksize else int(4.0 * sigma + 0.5)
+
+
+def _gaussian_mode(mode):
+    if mode not in GAUSSIAN_MODES:
+        raise ValueError(f"Unknown border mode: {mode} (available: {', '.join(GAUSSIAN_MODES)})")
+    return GAUSSIAN_MODES[mode]
+
+
+@register_backend("gaussian", "scipy")
+def _gaussian_scipy(image, sigma, ksize=None, mode="reflect", out=None):
+    from scipy import ndimage
+    _gaussian_mode(mode)
+    radius = gaussian_radius(sigma, ksize)
+    sigmas = (sigma, sigma) + (0,) * (image.ndim - 2)  # sigma 0 leaves the channel axis alone
+    result = ndimage.gaussian_filter(image, sigmas, output=np.float32, mode=mode,
+                                     truncate=radius / sigma)
+    return _to_output(result, image.dtype, out)
+
+
+@register_backend("gaussian", "opencv", supports=lambda image, *args, **kwargs: _channels(image) <= 4)
+def _gaussian_opencv(image, sigma, ksize=None, mode="reflect", out=None):
+    border = _gaussian_mode(mode)[1]
+    size = 2 * gaussian_radius(sigma, ksize) + 1
+    # float32 keeps the result within rounding of the other backends; the
+    # 8-bit fixed-point path can be off by 2 gray levels for large sigmas
+    # float input can be blurred straight into out
+    dst = None
+    if image.dtype != np.uint8 and out is not None:
+        out = resolve_out(out, image.shape, np.float32)
+        dst = opencv_dst(out)
+    result = cv2.GaussianBlur(image.astype(np.float32, copy=False), (size, size), sigma,
+                              dst=dst, borderType=border)
+    return _to_output(result, image.dtype, out)
+
+
+@register_backend("gaussian", "numpy")
+def _gaussian_numpy(image, sigma, ksize=None, mode="reflect", out=None):
+    pad_mode = _gaussian_mode(mode)[0]
+    weights = gaussian_kernel_1d(2 * gaussian_radius(sigma, ksize) + 1, sigma)
+    planes = image.reshape(image.shape[:2] + (-1,)).astype(np.float32, copy=False)
+    result = convolve_separable(planes, weights, weights, pad_mode=pad_mode)
+    return _to_output(result.reshape(image.shape), image.dtype, out)
+
+
+# ---- median(image, ksize) ----------------------------------------------------
+# Same result as scipy.ndimage.median_filter with a ksize × ksize window per
+# channel and mode='reflect'.
+
+@register_backend("median", "scipy")
+def _median_scipy(image, ksize, out=None):
+    from scipy import ndimage
+    size = (ksize, ksize) + (1,) * (image.ndim - 2)
+    dest = None if out is None else resolve_out(out, image.shape, image.dtype)
+    if dest is not None and not np.may_share_memory(dest, image):
+        ndimage.median_filter(image, size=size, output=dest, mode="reflect")
+        return dest
+    return write_out(ndimage.median_filter(image, size=size, mode="reflect"), dest)
+
+
+def _opencv_median_supported(image, ksize):
+    return image.dtype == np.uint8 and ksize % 2 == 1 and ksize > 1 and _channels(image) in (1, 3, 4)
+
+
+@register_backend("median", "opencv", supports=_opencv_median_supported)
+def _median_opencv(image, ksize, out=None):
+    # cv2.medianBlur replicates the edge pixels, so pad with scipy's borders first
+    r = ksize // 2
+    padded = cv2.copyMakeBorder(image, r, r, r, r, cv2.BORDER_REFLECT)
+    result = cv2.medianBlur(padded, ksize, dst=padded)[r:-r, r:-r]  # in place is supported
+    return write_out(result.reshape(image.shape), out)
+
+
+@register_backend("median", "numpy", supports=lambda image, ksize: ksize % 2 == 1
+                  and 1 < ksize * ksize <= MEDIAN_NETWORK_MAX)
+def _median_numpy(image, ksize, out=None):
+    # Sorting network over the ksize² shifted views of the padded image
+    r = ksize // 2
+    h, w = image.shape[:2]
+    pad = ((r, r), (r, r)) + ((0, 0),) * (image.ndim - 2)
+    padded = np.pad(image, pad, mode="symmetric")
+    shifted = [padded[i:i + h, j:j + w] for i in range(ksize) for j in range(ksize)]
+    return write_out(median_of_frames(shifted), out)
+
+
+# ---- convolve(image, kernel) -------------------------------------------------
+# Same result as scipy.signal.convolve2d(image, kernel, mode='same',
+# boundary='symm') in float32.
+
+def _odd_kernel(image, kernel):
+    return kernel.shape[0] % 2 == 1 and kernel.shape[1] % 2 == 1
+
+
+@register_backend("convolve", "scipy", supports=lambda image, kernel: image.ndim == 2)
+def _convolve_scipy(image, kernel, out=None):
+    from scipy.signal import convolve2d
+    return write_out(convolve2d(image.astype(np.float32, copy=False), kernel.astype(np.float32),
+                                mode="same", boundary="symm"), out)
+
+
+@register_backend("convolve", "opencv", supports=lambda image, kernel: _odd_kernel(image, kernel)
+                  and _channels(image) <= 4)
+def _convolve_opencv(image, kernel, out=None):
+    # filter2D correlates; flipping the kernel makes it a convolution
+    flipped = np.ascontiguousarray(kernel[::-1, ::-1], dtype=np.float32)
+    result = cv2.filter2D(image.astype(np.float32, copy=False), cv2.CV_32F, flipped,
+                          borderType=cv2.BORDER_REFLECT)
+    return write_out(result.reshape(image.shape), out)
+
+
+@register_backend("convolve", "numpy", supports=_odd_kernel)
+def _convolve_numpy(image, kernel, out=None):
+    flipped = kernel[::-1, ::-1]
+    planes = image.reshape(image.shape[:2] + (-1,)).astype(np.float32, copy=False)
+    factors = separable_factors(flipped)
+    if factors is not None:
+        result = convolve_separable(planes, *factors, pad_mode="symmetric")
+    else:
+        result = convolve_windowed(planes, flipped, pad_mode="symmetric")
+    return write_out(result.reshape(image.shape), out)
+
+
+@register_backend("convolve", "fft", supports=_odd_kernel)
+def _convolve_fft(image, kernel, out=None):
+    # 'symm' boundary in scipy is numpy's 'symmetric' padding
+    return write_out(fft_convolve(image, kernel, pad_mode="symmetric"), out)
+
+
+def _kernel_size(op, args, kwargs):
+    """Kernel size part of the calibration key"""
+    if op == "gaussian":
+        sigma = args[0] if args else kwargs.get("sigma", 1.0)
+        ksize = args[1] if len(args) > 1 else kwargs.get("ksize")
+        mode = args[2] if len(args) > 2 else kwargs.get("mode", "reflect")
+        _gaussian_mode(mode)
+        size = str(2 * gaussian_radius(sigma, ksize) + 1)
+        return size if mode == "reflect" else f"{size}{mode}"
+    if op == "median":
+        return str(args[0] if args else kwargs["ksize"])
+    kernel = np.asarray(args[0] if args else kwargs["kernel"])
+    return "x".join(map(str, kernel.shape))
+
+
+def size_bucket(shape):
+    """Image sizes are grouped in factors of 4: bucket b holds 4**b <= pixels < 4**(b+1)"""
+    pixels = max(1, shape[0] * shape[1])
+    return (pixels.bit_length() - 1) // 2
+
+
+def calibration_key(op, image, *args, **kwargs):
+    return f"{op}|{image.dtype}|c{_channels(image)}|k{_kernel_size(op, args, kwargs)}|b{size_bucket(image.shape)}"
+
+
+def _equivalent(result, reference):
+    if result.shape != reference.shape:
+        return False
+    diff = np.abs(result.astype(np.float32) - reference.astype(np.float32)).max(initial=0.0)
+    if reference.dtype == np.uint8:
+        return diff <= UINT8_TOLERANCE
+    return diff <= FLOAT_TOLERANCE * max(1.0, float(np.abs(reference).max(initial=0.0)))
+
+
+def _calibration_crop(image):
+    """Top-left crop of at most CALIBRATION_PIXELS with the image's aspect ratio"""
+    h, w = image.shape[:2]
+    scale = min(1.0, (CALIBRATION_PIXELS / (h * w)) ** 0.5)
+    return image[:max(1, int(h * scale)), :max(1, int(w * scale))]
+
+
+def calibrate(op, image, *args, **kwargs):
+    """
+    Time every backend that supports this input and store the fastest one
+    that matches the reference backend within tolerance.
+
+    Returns:
+        Calibration entry: {'backend', 'times' (seconds per backend), 'rejected'}
+    """
+    _check_op(op)
+    sample = _calibration_crop(image)
+    times, rejected, reference = {}, [], None
+    for name, (func, supports) in _backends[op].items():
+        if not supports(image, *args, **kwargs):
+            continue
+        try:
+            result = func(sample, *args, **kwargs)
+        except Exception:
+            rejected.append(name)
+            continue
+        if reference is None:
+            reference = result
+        elif not _equivalent(result, reference):
+            rejected.append(name)
+            continue
+        best = None
+        for _ in range(CALIBRATION_REPEAT):
+            start = time.perf_counter()
+            func(sample, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times[name] = best
+    if not times:
+        raise ValueError(f"No backend can run {op} on a {image.dtype} image of shape {image.shape}")
+
+    entry = {"backend": min(times, key=times.get), "times": times, "rejected": rejected}
+    with _lock:
+        _choices[calibration_key(op, image, *args, **kwargs)] = entry
+        _save_cache()
+    return entry
+
+
+def choose_backend(op, image, *args, **kwargs):
+    """Name of the backend a dispatch() call with these arguments would use"""
+    _check_op(op)
+    pinned = _pins.get(op)
+    if pinned is not None:
+        supports = _backends[op][pinned][1]
+        if supports(image, *args, **kwargs):
+            return pinned  # pins the input cannot use fall back to the calibrated choice
+    with _lock:
+        _load_cache()
+        entry = _choices.get(calibration_key(op, image, *args, **kwargs))
+        if entry is None or entry["backend"] not in _backends[op]:
+            entry = calibrate(op, image, *args, **kwargs)
+    return entry["backend"]
+
+
+def dispatch(op, image, *args, backend=None, out=None, **kwargs):
+    """
+    Run op on the fastest equivalent backend for this input.
+
+    backend forces one implementation for this call (ValueError if it cannot
+    handle the input); otherwise a pin from set_backend / ENHANCER_BACKEND is
+    used when it applies, then the calibrated choice. out is an optional
+    destination array or BufferPool for the result.
+    """
+    _check_op(op)
+    if backend is None:
+        backend = choose_backend(op, image, *args, **kwargs)
+    elif backend not in _backends[op]:
+        raise ValueError(f"Unknown {op} backend: {backend} (available: {', '.join(_backends[op])})")
+    elif not _backends[op][backend][1](image, *args, **kwargs):
+        raise ValueError(f"The {backend} backend cannot run {op} on a {image.dtype} image of shape {image.shape}")
+    return _backends[op][backend][0](image, *args, out=out, **kwargs)
+
+
+def set_backend(op, name):
+    """Pin op to one backend for the whole process; name=None re-enables automatic choice"""
+    _check_op(op)
+    if name is not None and name not in _backends[op]:
+        raise ValueError(f"Unknown {op} backend: {name} (available: {', '.join(_backends[op])})")
+    if name is None:
+        _pins.pop(op, None)
+    else:
+        _pins[op] = name
+
+
+def pinned_backends():
+    return dict(_pins)
+
+
+def calibration_table():
+    """Copy of the calibrated choices, keyed by calibration_key()"""
+    with _lock:
+        _load_cache()
+        return {key: dict(entry) for key, entry in _choices.items()}
+
+
+def clear_calibration(persist=True):
+    """Forget all calibrated choices (and the cache file when persist is True)"""
+    global _loaded
+    with _lock:
+        _choices.clear()
+        _loaded = True
+        if persist:
+            _save_cache()
+
+
+def cache_path():
+    """Calibration cache file, or None when the cache is memory only"""
+    path = os.environ.get("ENHANCER_BACKEND_CACHE", DEFAULT_CACHE_PATH)
+    return path or None
+
+
+def _environment():
+    """Calibrations are only reused on the same machine and library versions"""
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            scipy_version = version("scipy")
+        except PackageNotFoundError:
+            scipy_version = None
+    except ImportError:
+        scipy_version = None
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "scipy": scipy_version,
+    }
+
+
+def _load_cache():
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    path = cache_path()
+    if not path or not os.path.isfile(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return  # unreadable cache: calibrate again
+    if data.get("environment") == _environment():
+        _choices.update({key: entry for key, entry in data.get("choices", {}).items()
+                         if key not in _choices})
+
+
+def _save_cache():
+    path = cache_path()
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"environment": _environment(), "choices": _choices}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)  # atomic, so parallel workers never read half a file
+    except OSError as e:
+        print(f"Warning: Could not write backend calibration cache {path}: {e}", file=sys.stderr)
+
+
+def _parse_pins(text):
+    """'opencv' pins every operation that has that backend; 'op=name,...' pins per operation"""
+    pins = {}
+    for item in (part.strip() for part in text.split(",")):
+        if not item:
+            continue
+        op, sep, name = item.partition("=")
+        if not sep:
+            pins.update({op: item for op in DISPATCH_OPS if item in _backends[op]})
+        elif op.strip() in _backends and name.strip() in _backends[op.strip()]:
+            pins[op.strip()] = name.strip()
+        else:
+            print(f"Warning: Ignoring unknown backend pin '{item}' in ENHANCER_BACKEND", file=sys.stderr)
+    return pins
+
+
+_pins.update(_parse_pins(os.environ.get("ENHANCER_BACKEND", "")))
@@ -0,0 +1,147 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+# Free buffers kept by a BufferPool before the least recently released are dropped
+DEFAULT_POOL_BYTES = 512 * 1024 * 1024
+
+
+class BufferPool:
+    """
+    Reusable arrays keyed by (shape, dtype).
+
+    acquire() hands out a free array of the requested shape and dtype, or
+    allocates one; release() gives it back. A pipeline that processes
+    same-sized images therefore reaches a steady state where acquire()
+    never allocates. Every filter with an out= argument also accepts a pool
+    there and takes its destination from it.
+
+    Thread-safe. At most max_bytes of free buffers are kept; buffers that
+    were handed out and never released are simply garbage collected.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self._free = OrderedDict()              # (shape, dtype) -> [arrays], least recently used first
+        self._lent = weakref.WeakValueDictionary()  # id -> array handed out and not yet released
+        self._free_bytes = 0
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Uninitialized C-contiguous array of this shape and dtype"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            buffers = self._free.get(key)
+            if buffers:
+                array = buffers.pop()
+                if not buffers:
+                    del self._free[key]
+                self._free_bytes -= array.nbytes
+                self.reuses += 1
+            else:
+                array = None
+                self.allocations += 1
+        if array is None:
+            array = np.empty(key[0], dtype=key[1])
+        with self._lock:
+            self._lent[id(array)] = array
+        return array
+
+    def like(self, image):
+        return self.acquire(image.shape, image.dtype)
+
+    def owns(self, array):
+        """Whether array was handed out by this pool and not released yet"""
+        with self._lock:
+            return self._lent.get(id(array)) is array
+
+    def release(self, array):
+        """
+        Give an acquired array back for reuse. Arrays this pool did not hand
+        out (or that were already released) are ignored.
+
+        Returns:
+            True when the array went back to the pool
+        """
+        with self._lock:
+            # Checked and removed under one lock, so two threads releasing the
+            # same array cannot both put it back
+            if self._lent.get(id(array)) is not array:
+                return False
+            del self._lent[id(array)]
+            if self.max_bytes is not None and array.nbytes > self.max_bytes:
+                return False
+            key = (array.shape, array.dtype.str)
+            self._free.setdefault(key, []).append(array)
+            self._free.move_to_end(key)
+            self._free_bytes += array.nbytes
+            while self.max_bytes is not None and self._free_bytes > self.max_bytes:
+                oldest_key, buffers = next(iter(self._free.items()))
+                self._free_bytes -= buffers.pop(0).nbytes
+                if not buffers:
+                    del self._free[oldest_key]
+        return True
+
+    def clear(self):
+        """Drop all free buffers"""
+        with self._lock:
+            self._free.clear()
+            self._free_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "free_buffers": sum(len(buffers) for buffers in self._free.values()),
+                "free_bytes": self._free_bytes,
+                "lent": len(self._lent),
+            }
+
+
+def resolve_out(out, shape, dtype):
+    """
+    Destination array for a filter's out= argument: a new array when out is
+    None, one from the pool when out is a BufferPool, otherwise out itself
+    after checking its shape and dtype.
+    """
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if isinstance(out, BufferPool):
+        return out.acquire(shape, dtype)
+    if out.shape != tuple(shape) or out.dtype != np.dtype(dtype):
+        raise ValueError(f"out has shape {out.shape} and dtype {out.dtype}, "
+                         f"expected {tuple(shape)} and {np.dtype(dtype)}")
+    return out
+
+
+def write_out(result, out, dtype=None):
+    """
+    Return result as the filter's output: unchanged (or cast to dtype) when
+    out is None, otherwise copied into the resolved out array (casting like
+    astype, i.e. truncating floats). Overlap between result and out is safe.
+    """
+    dtype = result.dtype if dtype is None else np.dtype(dtype)
+    if out is None:
+        return result if result.dtype == dtype else result.astype(dtype)
+    dest = resolve_out(out, result.shape, dtype)
+    if dest is not result:
+        np.copyto(dest, result, casting='unsafe')
+    return dest
+
+
+def opencv_dst(dest, source=None):
+    """
+    dest if an OpenCV function can write into it directly (C-contiguous and,
+    when source is given, not overlapping it), else None so the result is
+    allocated and copied by write_out().
+    """
+    if dest is None or not dest.flags.c_contiguous:
+        return None
+    if source is not None and np.may_share_memory(dest, source):
+        return None
+    return dest
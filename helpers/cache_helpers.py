@@ -0,0 +1,99 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bytes of cached results kept before the least recently used are dropped
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def content_key(data):
+    """Hex digest identifying bytes (e.g. an uploaded file) by their content"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, "nbytes", 0)  # arrays and objects reporting their size
+
+
+class ResultCache:
+    """
+    Bounded LRU of computed results (decoded images, filter outputs, encoded
+    files) measured in bytes.
+
+    Keys are any hashable tuple, typically (content_key(upload), operation,
+    parameters...). Cached arrays are made read-only, since every caller
+    gets the same object back. Other objects count with their nbytes
+    attribute, measured when put(); put them again after they grew.
+
+    Thread-safe. A result larger than max_bytes is returned but not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store value under key (replacing any previous one) and return it"""
+        for array in (value if isinstance(value, tuple) else (value,)):
+            if isinstance(array, np.ndarray):
+                array.setflags(write=False)
+        size = _nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self.max_bytes is not None and self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, or compute() stored under key"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
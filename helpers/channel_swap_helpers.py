@@ -1,7 +1,10 @@
 import numpy as np
-import cv2
+from helpers.buffer_helpers import resolve_out
+from helpers.color_matrix_helpers import CHANNEL_PERMUTATIONS, apply_color_matrix, permutation_matrix
+from helpers.profiling import profiled
 
-def apply_channel_swap(image, mode='rgb'):
+@profiled
+def apply_channel_swap(image, mode='rgb', out=None):
     """
     Swap or manipulate color channels of an image
     
@@ -17,32 +20,28 @@ def apply_channel_swap(image, mode='rgb'):
             'r' - Keep only red channel
             'g' - Keep only green channel
             'b' - Keep only blue channel
+        out: Optional destination array or BufferPool (may be the image itself)
     
     Returns:
-        Image with modified color channels (numpy array)
+        Image with modified color channels (numpy array). Without out, pure
+        reorderings may share memory with the input.
     """
-    if mode == 'rgb':
-        return image.copy()
-    
-    # Split channels
-    b, g, r = cv2.split(image)
-    
-    # Apply different channel combinations
-    if mode == 'rbg':
-        return cv2.merge((g, b, r))
-    elif mode == 'grb':
-        return cv2.merge((b, r, g))
-    elif mode == 'gbr':
-        return cv2.merge((g, r, b))
-    elif mode == 'brg':
-        return cv2.merge((r, b, g))
-    elif mode == 'bgr':
-        return cv2.merge((r, g, b))
-    elif mode == 'r':
-        return cv2.merge(( np.zeros_like(r), np.zeros_like(r), r))
-    elif mode == 'g':
-        return cv2.merge((np.zeros_like(g), g, np.zeros_like(g)))
-    elif mode == 'b':
-        return cv2.merge((b, np.zeros_like(b), np.zeros_like(b)))
-    else:
-        raise ValueError(f"Unknown channel mode: {mode}")
\ No newline at end of file
+    if mode in CHANNEL_PERMUTATIONS:
+        # 'rgb' and 'bgr' come back as views, the others as one gather
+        return apply_color_matrix(image, permutation_matrix(CHANNEL_PERMUTATIONS[mode]), out=out)
+
+    # Keep a single channel, zero the others
+    keep = {'b': 0, 'g': 1, 'r': 2}.get(mode)
+    if keep is None:
+        raise ValueError(f"Unknown channel mode: {mode}")
+    if out is None:
+        result = np.zeros_like(image)
+        result[..., keep] = image[..., keep]
+        return result
+    result = resolve_out(out, image.shape, image.dtype)
+    for c in range(image.shape[2]):
+        if c != keep:
+            result[..., c] = 0
+    if result is not image:
+        result[..., keep] = image[..., keep]
+    return result
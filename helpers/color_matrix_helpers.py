@@ -0,0 +1,154 @@
+import numpy as np
+
+from helpers.buffer_helpers import resolve_out, write_out
+from helpers.profiling import profiled
+
+# Weights are stored as integers scaled by 2**FIXED_POINT_BITS (like OpenCV)
+FIXED_POINT_BITS = 14
+_ONE = 1 << FIXED_POINT_BITS
+_HALF = 1 << (FIXED_POINT_BITS - 1)
+
+# Rows are output channels, columns are input channels in the image's own order
+GRAYSCALE_WEIGHTS = (0.299, 0.587, 0.114)
+GRAYSCALE_MATRIX = np.array([GRAYSCALE_WEIGHTS] * 3)
+
+# Classic sepia tone for BGR images (OpenCV channel order)
+SEPIA_MATRIX = np.array([
+    [0.131, 0.534, 0.272],
+    [0.168, 0.686, 0.349],
+    [0.189, 0.769, 0.393],
+])
+
+# Output channel order of every apply_channel_swap mode (input is B, G, R)
+CHANNEL_PERMUTATIONS = {
+    'rgb': (0, 1, 2),
+    'rbg': (1, 0, 2),
+    'grb': (0, 2, 1),
+    'gbr': (1, 2, 0),
+    'brg': (2, 0, 1),
+    'bgr': (2, 1, 0),
+}
+
+
+def permutation_matrix(order):
+    """3x3 matrix whose output channel i is input channel order[i]"""
+    matrix = np.zeros((len(order), 3))
+    matrix[np.arange(len(order)), order] = 1.0
+    return matrix
+
+
+def to_fixed_point(matrix):
+    """Round a float matrix to int32 fixed-point weights"""
+    return np.round(np.asarray(matrix, dtype=np.float64) * _ONE).astype(np.int32)
+
+
+def _as_permutation(matrix):
+    """Return the channel order if matrix (without offsets) only reorders channels, else None"""
+    if matrix.shape != (3, 3) or not np.all((matrix == 0) | (matrix == 1)):
+        return None
+    if not (np.all(matrix.sum(axis=1) == 1) and np.all(matrix.sum(axis=0) == 1)):
+        return None
+    return tuple(int(i) for i in matrix.argmax(axis=1))
+
+
+def _permute(image, order):
+    """Reorder channels, as a view whenever the order is expressible by strides"""
+    if order == (0, 1, 2):
+        return image[..., :3]
+    if order == (2, 1, 0):
+        return image[..., 2::-1]
+    return image[..., list(order)]  # one gather pass, no arithmetic
+
+
+def _mix_plane(image, weights, offset, rounding=True, out=None):
+    """
+    One output channel: sum of fixed-point weights * input channels, rounded
+    (or truncated) and clipped. The sum is complete before out is written,
+    so out may be one of the image's channels.
+    """
+    nonzero = [(c, int(w)) for c, w in enumerate(weights) if w]
+    if offset == 0 and len(nonzero) == 1 and nonzero[0][1] == _ONE:
+        return write_out(image[..., nonzero[0][0]], out)  # plain channel, no arithmetic
+    if rounding:
+        offset += _HALF
+    if not nonzero:
+        dest = resolve_out(out, image.shape[:2], np.uint8)
+        dest.fill(np.clip(offset >> FIXED_POINT_BITS, 0, 255))
+        return dest
+
+    acc = np.full(image.shape[:2], offset, dtype=np.int32)
+    for c, w in nonzero:
+        acc += image[..., c] * np.int32(w)
+    acc >>= FIXED_POINT_BITS
+    np.clip(acc, 0, 255, out=acc)
+    return write_out(acc, out, np.uint8)
+
+
+@profiled
+def apply_color_matrix(image, matrix, single_channel=False, rounding=True, out=None):
+    """
+    Mix the channels of a uint8 H×W×3 image with a 3x3 or 3x4 matrix.
+
+    Args:
+        image: Input image (numpy array, uint8)
+        matrix: Rows are output channels, columns input channels (in the
+            image's order); an optional 4th column is an offset in 0-255 units
+        single_channel: When every output row is identical (e.g. grayscale),
+            return the H×W plane instead of an H×W×3 view of it
+        rounding: Round to the nearest value (default) or truncate like astype(np.uint8)
+        out: Optional destination array or BufferPool (may be the image itself)
+
+    Returns:
+        uint8 image. Without out, identity and channel reversal come back as
+        zero-copy views, other permutations as one gather, identical rows as
+        one plane broadcast to three channels (read-only view).
+    """
+    if image.ndim != 3 or image.shape[2] < 3:
+        raise ValueError("Image must have 3 color channels")
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] not in (3, 4):
+        raise ValueError(f"Color matrix must be 3x3 or 3x4, got {matrix.shape}")
+    weights = matrix[:, :3]
+    offsets = matrix[:, 3] if matrix.shape[1] == 4 else np.zeros(len(matrix))
+
+    if not offsets.any():
+        order = _as_permutation(weights)
+        if order is not None:
+            return write_out(_permute(image, order), out)  # works for any dtype
+
+    if image.dtype != np.uint8:
+        raise TypeError(f"Color matrices need a uint8 image, got {image.dtype}")
+
+    fixed = to_fixed_point(weights)
+    fixed_offsets = to_fixed_point(offsets)
+
+    if np.all(fixed == fixed[0]) and np.all(fixed_offsets == fixed_offsets[0]):
+        if single_channel:
+            return _mix_plane(image, fixed[0], int(fixed_offsets[0]), rounding, out)
+        plane = _mix_plane(image, fixed[0], int(fixed_offsets[0]), rounding)
+        planes = np.broadcast_to(plane[..., None], plane.shape + (len(matrix),))
+        return planes if out is None else write_out(planes, out)
+
+    dest = resolve_out(out, image.shape[:2] + (len(matrix),), np.uint8)
+    # Every plane reads all input channels, so in place needs a scratch result
+    target = np.empty_like(dest) if np.may_share_memory(dest, image) else dest
+    for i in range(len(matrix)):
+        _mix_plane(image, fixed[i], int(fixed_offsets[i]), rounding, out=target[..., i])
+    return write_out(target, dest)
+
+
+@profiled
+def grayscale_plane(image, out=None):
+    """
+    Single H×W grayscale plane using the perceptual weights.
+    Truncates like the original float conversion did, so results match it
+    except where the float sum sat within rounding error of an integer.
+    """
+    return apply_color_matrix(image, GRAYSCALE_MATRIX, single_channel=True, rounding=False, out=out)
+
+
+@profiled
+def apply_sepia(image, out=None):
+    """Sepia tone for a BGR uint8 image"""
+    return apply_color_matrix(image, SEPIA_MATRIX, out=out)
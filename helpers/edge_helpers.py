@@ -1,5 +1,8 @@
+import cv2
 import numpy as np
-from scipy.signal import convolve2d
+from helpers.backend_helpers import dispatch
+from helpers.buffer_helpers import resolve_out, write_out
+from helpers.profiling import profiled
 
 def get_sobel_kernels():
     """Return the Sobel kernels for horizontal and vertical edge detection"""
@@ -18,10 +21,19 @@ def get_sobel_kernels():
     
     return sobel_x, sobel_y
 
-def apply_convolution(image, kernel):
-    """Apply 2D convolution to the image using the given kernel"""
-    # Use scipy's optimized convolution
-    return convolve2d(image, kernel, mode='same', boundary='symm')
+@profiled
+def apply_convolution(image, kernel, method='auto', out=None):
+    """
+    Apply 2D convolution to the image using the given kernel
+
+    method: 'auto' (fastest backend calibrated for this machine), 'direct'
+    (scipy) or one of the backend names 'scipy', 'opencv', 'numpy', 'fft'
+    out: optional float32 destination array or BufferPool
+    """
+    if method == 'direct':
+        method = 'scipy'
+    return dispatch("convolve", image, np.asarray(kernel), backend=None if method == 'auto' else method,
+                    out=out)
 
 def normalize_edges(edges, sensitivity=1.0):
     """Normalize edge values to 0-255 range and apply sensitivity adjustment"""
@@ -32,4 +44,78 @@ def normalize_edges(edges, sensitivity=1.0):
     # Clip to 0-1 range
     edges = np.clip(edges, 0, 1)
     # Convert to uint8
-    return (edges * 255).astype(np.uint8) 
\ No newline at end of file
+    return (edges * 255).astype(np.uint8)
+
+def normalize_edges_fused(edges, sensitivity=1.0, out=None):
+    """
+    normalize_edges for a float32 edge map, computed in place with a single
+    min/max pass instead of separate temporaries.
+    """
+    low, high = cv2.minMaxLoc(edges)[:2]
+    if high <= low:
+        if out is None:
+            return np.zeros(edges.shape, dtype=np.uint8)
+        dest = resolve_out(out, edges.shape, np.uint8)
+        dest.fill(0)
+        return dest
+    edges -= low
+    edges *= np.float32(255.0 * sensitivity / (high - low))
+    np.clip(edges, 0, 255, out=edges)
+    return write_out(edges, out, np.uint8)
+
+
+def sobel_gradients(gray):
+    """
+    Sobel x/y gradients of a single-channel image with the same sign and
+    border handling as apply_convolution(gray, get_sobel_kernels()[i]).
+    uint8 input gives exact int16 gradients, anything else float32.
+    """
+    ddepth = cv2.CV_16S if gray.dtype == np.uint8 else cv2.CV_32F
+    src = gray if gray.dtype == np.uint8 else gray.astype(np.float32)
+    # scipy's 'symm' boundary is BORDER_REFLECT; convolution flips the kernel,
+    # which for the antisymmetric Sobel kernels just negates cv2's correlation
+    gx = cv2.Sobel(src, ddepth, 1, 0, ksize=3, scale=-1, borderType=cv2.BORDER_REFLECT)
+    gy = cv2.Sobel(src, ddepth, 0, 1, ksize=3, scale=-1, borderType=cv2.BORDER_REFLECT)
+    return gx, gy
+
+
+@profiled
+def detect_edges(gray, sensitivity=1.0, direction='both', method='fused', out=None):
+    """
+    Sobel edge detection on a single-channel (H×W) image.
+    Returns the normalized uint8 edge plane (written to out when given, which
+    may be gray itself).
+
+    method='fused' (default) runs cv2.Sobel in int16 and the magnitude and
+    normalization in float32; it matches method='convolve' (the original
+    float64 scipy path) to within 1 gray level.
+    """
+    if method == 'fused':
+        gx, gy = sobel_gradients(gray)
+        if direction == 'horizontal':
+            edges = gx.astype(np.float32)
+        elif direction == 'vertical':
+            edges = gy.astype(np.float32)
+        else:  # both
+            edges = cv2.magnitude(gx.astype(np.float32), gy.astype(np.float32))
+        return normalize_edges_fused(edges, sensitivity, out)
+
+    if method != 'convolve':
+        raise ValueError(f"Unknown edge detection method: {method}")
+
+    # Get Sobel kernels
+    sobel_x, sobel_y = get_sobel_kernels()
+
+    # Apply edge detection based on direction
+    if direction == 'horizontal':
+        edges = apply_convolution(gray, sobel_x)
+    elif direction == 'vertical':
+        edges = apply_convolution(gray, sobel_y)
+    else:  # both
+        edges_x = apply_convolution(gray, sobel_x)
+        edges_y = apply_convolution(gray, sobel_y)
+        # Calculate magnitude of gradient
+        edges = np.sqrt(edges_x**2 + edges_y**2)
+
+    # Normalize and apply sensitivity
+    return write_out(normalize_edges(edges, sensitivity), out)
@@ -0,0 +1,261 @@
+from collections import OrderedDict
+from functools import lru_cache
+import math
+
+import numpy as np
+
+from helpers.buffer_helpers import write_out
+from helpers.profiling import profiled
+
+# Direct convolution costs ~k*k (or 2*k when separable) multiply-adds per
+# pixel, an FFT round trip costs roughly FFT_COST_FACTOR * log2(N) per pixel.
+# The factor was measured on the numpy/scipy paths used in this project.
+FFT_COST_FACTOR = 0.5
+
+# Padded kernel spectra and frequency-domain transfer functions, keyed by
+# (fft shape, kernel bytes / filter parameters). Bounded LRU.
+SPECTRUM_CACHE_SIZE = 32
+_spectrum_cache = OrderedDict()
+
+
+def _sfft():
+    """scipy.fft, imported on first use so that importing the filters stays fast"""
+    from scipy import fft
+    return fft
+
+
+def clear_spectrum_cache():
+    """Drop all cached kernel spectra and transfer functions"""
+    _spectrum_cache.clear()
+
+
+def _cached_spectrum(key, build):
+    """Return the spectrum stored under key, building (and caching) it if missing"""
+    spectrum = _spectrum_cache.get(key)
+    if spectrum is not None:
+        _spectrum_cache.move_to_end(key)
+        return spectrum
+
+    spectrum = build()
+    spectrum.setflags(write=False)
+    _spectrum_cache[key] = spectrum
+    if len(_spectrum_cache) > SPECTRUM_CACHE_SIZE:
+        _spectrum_cache.popitem(last=False)
+    return spectrum
+
+
+@lru_cache(maxsize=128)
+def fast_fft_shape(height, width):
+    """
+    Smallest (height, width) >= the input that real FFTs handle quickly.
+    Using the same shape for every image of a given size lets scipy.fft reuse
+    its cached plans and lets us reuse cached kernel spectra.
+    """
+    return (_sfft().next_fast_len(height, real=True),
+            _sfft().next_fast_len(width, real=True))
+
+
+def should_use_fft(image_shape, kernel_shape, separable=False):
+    """
+    Decide whether FFT convolution beats direct convolution.
+
+    Args:
+        image_shape: Shape of the image (H, W[, C])
+        kernel_shape: Shape of the 2D kernel (kh, kw)
+        separable: Whether the direct path would run as two 1D passes
+
+    Returns:
+        True when the FFT backend is expected to be faster
+    """
+    kh, kw = kernel_shape[:2]
+    if kh % 2 == 0 or kw % 2 == 0:
+        return False  # FFT path only reproduces 'same' output for odd kernels
+    h, w = image_shape[:2]
+    direct_cost = (kh + kw) if separable else (kh * kw)
+    fft_h, fft_w = fast_fft_shape(h + kh - 1, w + kw - 1)
+    fft_cost = FFT_COST_FACTOR * math.log2(fft_h * fft_w)
+    return direct_cost > fft_cost
+
+
+def kernel_spectrum(kernel, fft_shape, correlate=False):
+    """
+    Real FFT of a kernel zero-padded to fft_shape (cached).
+
+    With correlate=True the kernel is flipped first, so multiplying by the
+    spectrum computes a correlation instead of a convolution.
+    """
+    kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+    key = ('kernel', fft_shape, kernel.shape, bool(correlate), kernel.tobytes())
+
+    def build():
+        k = kernel[::-1, ::-1] if correlate else kernel
+        return _sfft().rfft2(k, s=fft_shape)
+
+    return _cached_spectrum(key, build)
+
+
+@profiled
+def fft_convolve(image, kernel, pad_mode='reflect', correlate=False):
+    """
+    Convolve a 2D (H×W) or 3D (H×W×C) image with an odd-sized 2D kernel via FFT.
+
+    Args:
+        image: Input image (numpy array)
+        kernel: 2D kernel with odd height and width
+        pad_mode: numpy pad mode used for the borders ('reflect', 'symmetric', ...)
+        correlate: Slide the kernel without flipping it (like convolve2d in
+            unsharp_mask_helpers) instead of a true convolution
+
+    Returns:
+        float32 result with the same shape as the image
+    """
+    kernel = np.asarray(kernel)
+    kh, kw = kernel.shape
+    if kh % 2 == 0 or kw % 2 == 0:
+        raise ValueError(f"FFT convolution needs an odd kernel size, got {kernel.shape}")
+
+    squeeze = image.ndim == 2
+    if squeeze:
+        image = image[:, :, None]
+    h, w = image.shape[:2]
+    pad_h, pad_w = kh // 2, kw // 2
+
+    padded = np.pad(image.astype(np.float32, copy=False),
+                    ((pad_h, pad_h), (pad_w, pad_w), (0, 0)),
+                    mode=pad_mode)
+    fft_shape = fast_fft_shape(*padded.shape[:2])
+    spectrum = kernel_spectrum(kernel, fft_shape, correlate)
+
+    image_spectrum = _sfft().rfft2(padded, s=fft_shape, axes=(0, 1))
+    image_spectrum *= spectrum[:, :, None]
+    full = _sfft().irfft2(image_spectrum, s=fft_shape, axes=(0, 1))
+
+    # Circular wrap-around only touches the first kh-1 / kw-1 rows / columns
+    out = full[kh - 1:kh - 1 + h, kw - 1:kw - 1 + w]
+    out = np.ascontiguousarray(out, dtype=np.float32)
+    return out[:, :, 0] if squeeze else out
+
+
+def _frequency_distance(fft_shape):
+    """Distance of every rfft2 bin from DC, normalized so 1.0 is the Nyquist frequency"""
+    fy = _sfft().fftfreq(fft_shape[0])[:, None]
+    fx = _sfft().rfftfreq(fft_shape[1])[None, :]
+    return np.sqrt(fy**2 + fx**2) / 0.5, fy, fx
+
+
+def transfer_function(fft_shape, mode='lowpass', kind='butterworth', cutoff=0.25,
+                      order=2, notches=()):
+    """
+    Frequency response on the rfft2 grid of fft_shape (cached).
+
+    Args:
+        fft_shape: (height, width) of the transform
+        mode: 'lowpass', 'highpass' or 'notch'
+        kind: 'ideal' or 'butterworth'
+        cutoff: Cut-off as a fraction of Nyquist (lowpass/highpass), or the
+            notch radius in the same units (notch)
+        order: Butterworth order
+        notches: For 'notch', iterable of (fy, fx) centers in cycles/pixel
+            (-0.5 to 0.5). The mirrored (-fy, -fx) notch is added automatically.
+    """
+    if mode not in ('lowpass', 'highpass', 'notch'):
+        raise ValueError(f"Unknown frequency filter mode: {mode}")
+    if kind not in ('ideal', 'butterworth'):
+        raise ValueError(f"Unknown frequency filter kind: {kind}")
+    if cutoff <= 0:
+        raise ValueError(f"Cut-off must be greater than 0, got {cutoff}")
+
+    notches = tuple((float(fy), float(fx)) for fy, fx in notches)
+    key = ('transfer', fft_shape, mode, kind, float(cutoff), order, notches)
+
+    def build():
+        dist, fy, fx = _frequency_distance(fft_shape)
+        if mode == 'notch':
+            response = np.ones_like(dist)
+            for cy, cx in notches:
+                for sy, sx in ((cy, cx), (-cy, -cx)):
+                    # Distance to the notch center, wrapping like the fft grid
+                    dy = (fy - sy + 0.5) % 1.0 - 0.5
+                    dx = fx - sx
+                    d = np.sqrt(dy**2 + dx**2) / 0.5
+                    if kind == 'ideal':
+                        response *= d > cutoff
+                    else:
+                        with np.errstate(divide='ignore'):
+                            response *= 1.0 / (1.0 + (cutoff / d)**(2 * order))
+            return response.astype(np.float32)
+
+        if kind == 'ideal':
+            response = (dist <= cutoff).astype(np.float32)
+        else:
+            response = (1.0 / (1.0 + (dist / cutoff)**(2 * order))).astype(np.float32)
+        return 1.0 - response if mode == 'highpass' else response
+
+    return _cached_spectrum(key, build)
+
+
+@profiled
+def apply_frequency_filter(image, mode='lowpass', kind='butterworth', cutoff=0.25,
+                           order=2, notches=(), out=None):
+    """
+    Filter an image in the frequency domain.
+
+    Args:
+        image: Input H×W or H×W×C image
+        mode: 'lowpass', 'highpass' or 'notch'
+        kind: 'ideal' or 'butterworth'
+        cutoff: Cut-off frequency as a fraction of Nyquist (0-1], or the notch radius
+        order: Butterworth order (default: 2)
+        notches: (fy, fx) notch centers in cycles/pixel, only used by 'notch'
+        out: Optional destination array or BufferPool (may be the image itself)
+
+    Returns:
+        Filtered image (uint8 for uint8 input, float32 otherwise)
+    """
+    squeeze = image.ndim == 2
+    img = image[:, :, None] if squeeze else image
+    h, w = img.shape[:2]
+
+    # Pad to a fast size with mirrored borders to limit wrap-around artifacts
+    fft_shape = fast_fft_shape(h, w)
+    padded = np.pad(img.astype(np.float32, copy=False),
+                    ((0, fft_shape[0] - h), (0, fft_shape[1] - w), (0, 0)),
+                    mode='symmetric')
+    response = transfer_function(fft_shape, mode, kind, cutoff, order, notches)
+
+    spectrum = _sfft().rfft2(padded, axes=(0, 1))
+    spectrum *= response[:, :, None]
+    result = _sfft().irfft2(spectrum, s=fft_shape, axes=(0, 1))[:h, :w]
+
+    if squeeze:
+        result = result[:, :, 0]
+    if image.dtype == np.uint8:
+        return write_out(np.clip(result, 0, 255, out=result), out, np.uint8)
+    if out is None:
+        return result.astype(np.float32)  # contiguous, without holding on to the padded transform
+    return write_out(result, out, np.float32)
+
+
+def ideal_lowpass(image, cutoff=0.25):
+    """Ideal (brick-wall) low-pass filter, cutoff as a fraction of Nyquist"""
+    return apply_frequency_filter(image, 'lowpass', 'ideal', cutoff)
+
+
+def butterworth_lowpass(image, cutoff=0.25, order=2):
+    """Butterworth low-pass filter, cutoff as a fraction of Nyquist"""
+    return apply_frequency_filter(image, 'lowpass', 'butterworth', cutoff, order)
+
+
+def ideal_highpass(image, cutoff=0.25):
+    """Ideal (brick-wall) high-pass filter, cutoff as a fraction of Nyquist"""
+    return apply_frequency_filter(image, 'highpass', 'ideal', cutoff)
+
+
+def butterworth_highpass(image, cutoff=0.25, order=2):
+    """Butterworth high-pass filter, cutoff as a fraction of Nyquist"""
+    return apply_frequency_filter(image, 'highpass', 'butterworth', cutoff, order)
+
+
+def notch_filter(image, notches, radius=0.02, kind='butterworth', order=2):
+    """Remove periodic noise at the given (fy, fx) frequencies (cycles/pixel)"""
+    return apply_frequency_filter(image, 'notch', kind, radius, order, notches)
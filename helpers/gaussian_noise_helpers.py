@@ -1,27 +1,50 @@
+from functools import lru_cache
+
 import numpy as np
 
-def add_gaussian_noise(image, intensity=0.1):
+from helpers.buffer_helpers import write_out
+from helpers.profiling import profiled
+from helpers.random_helpers import make_rng
+
+
+@lru_cache(maxsize=4)
+def cached_unit_noise(shape, seed=0):
+    """
+    Standard-normal float32 field for an image shape, memoized per (shape, seed).
+    Changing only the intensity rescales this field instead of resampling.
+    """
+    field = np.random.default_rng(seed).standard_normal(shape, dtype=np.float32)
+    field.setflags(write=False)
+    return field
+
+
+@profiled
+def add_gaussian_noise(image, intensity=0.1, seed=None, rng=None, out=None, reuse_field=False):
     """
     Add Gaussian noise to an image
     
     Args:
         image: Input image (numpy array)
         intensity: Noise intensity, controls standard deviation (default: 0.1)
+        seed: Seed for a fresh numpy Generator (int or SeedSequence)
+        rng: numpy Generator to draw from (takes precedence over seed)
+        out: Optional uint8 array (may be image itself) or BufferPool for the result
+        reuse_field: Rescale a cached unit-noise field for (shape, seed)
+            instead of drawing new samples (seed defaults to 0)
     
     Returns:
         Image with added Gaussian noise
     """
-    # Convert to float for calculations
-    img_float = image.astype(np.float32)
-
-    # Generate Gaussian noise
-    std_dev = intensity * 255.0
-    noise = np.random.normal(loc=0, scale=std_dev, size=img_float.shape)
-
-    # Add noise to image
-    noisy_img = img_float + noise
+    std_dev = np.float32(intensity * 255.0)
 
-    # Clip values to valid range and convert back to uint8
-    noisy_img = np.clip(noisy_img, 0, 255).astype(np.uint8)
+    # Generate Gaussian noise in float32
+    if reuse_field:
+        noisy_img = cached_unit_noise(image.shape, 0 if seed is None else seed) * std_dev
+    else:
+        noisy_img = make_rng(seed, rng).standard_normal(image.shape, dtype=np.float32)
+        noisy_img *= std_dev
 
-    return noisy_img
\ No newline at end of file
+    # Add noise to image, clip to the valid range and convert back to uint8
+    noisy_img += image
+    np.clip(noisy_img, 0, 255, out=noisy_img)
+    return write_out(noisy_img, out, np.uint8)
@@ -0,0 +1,110 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from helpers.brightness_helpers import get_brightness_factor
+from helpers.buffer_helpers import opencv_dst, resolve_out
+from helpers.profiling import profiled
+
+_IDENTITY = np.arange(256, dtype=np.uint8)
+
+
+def _freeze(lut):
+    """Make a compiled table safe to share between callers"""
+    lut = np.ascontiguousarray(lut, dtype=np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+@lru_cache(maxsize=None)
+def brightness_lut(level=0):
+    """Lookup table for apply_brightness at the given level"""
+    factor = get_brightness_factor(level)
+    return _freeze(np.clip(_IDENTITY * factor, 0, 255))
+
+
+@lru_cache(maxsize=16)
+def brightness_levels_table(levels):
+    """One (len(levels), 256) table holding the brightness lookup table of every level"""
+    return _freeze(np.stack([brightness_lut(level) for level in levels]))
+
+
+@lru_cache(maxsize=None)
+def invert_lut():
+    """Lookup table for color inversion (255 - value)"""
+    return _freeze(255 - _IDENTITY)
+
+
+@lru_cache(maxsize=64)
+def gamma_lut(gamma=1.0):
+    """Lookup table for gamma correction: 255 * (value / 255) ** (1 / gamma)"""
+    if gamma <= 0:
+        raise ValueError(f"Gamma must be greater than 0, got {gamma}")
+    return _freeze(np.round(255.0 * (_IDENTITY / 255.0) ** (1.0 / gamma)))
+
+
+@lru_cache(maxsize=64)
+def contrast_lut(alpha=1.0, beta=0.0):
+    """Lookup table for linear contrast: alpha * (value - 128) + 128 + beta, clipped"""
+    values = alpha * (_IDENTITY.astype(np.float64) - 128.0) + 128.0 + beta
+    return _freeze(np.clip(np.round(values), 0, 255))
+
+
+POINT_LUTS = {
+    "brightness": brightness_lut,
+    "invert": invert_lut,
+    "gamma": gamma_lut,
+    "contrast": contrast_lut,
+}
+
+
+def compose_luts(*luts):
+    """Single table equivalent to applying luts in order"""
+    result = _IDENTITY
+    for lut in luts:
+        result = lut[result]
+    return _freeze(result)
+
+
+@lru_cache(maxsize=256)
+def _compile(operations):
+    return compose_luts(*(POINT_LUTS[name](**dict(params)) for name, params in operations))
+
+
+def compile_point_ops(operations):
+    """
+    Compile an ordered list of point operations into one cached lookup table.
+
+    Args:
+        operations: Sequence of (name, params) pairs, e.g.
+            [("brightness", {"level": 2}), ("invert", {})]
+
+    Returns:
+        Read-only uint8 array of 256 entries
+    """
+    key = []
+    for name, params in operations:
+        if name not in POINT_LUTS:
+            raise ValueError(f"Unknown point operation: {name}")
+        key.append((name, tuple(sorted(params.items()))))
+    return _compile(tuple(key))
+
+
+@profiled
+def apply_lut(image, lut, out=None):
+    """
+    Map every uint8 value of an image (any number of channels) through lut.
+    One memory-bound pass, no floating point temporaries.
+    out: optional destination array or BufferPool; may be image itself.
+    """
+    if image.dtype != np.uint8:
+        raise TypeError(f"Lookup tables need a uint8 image, got {image.dtype}")
+    opencv = image.ndim <= 2 or image.shape[2] <= 4  # cv2 handles up to 4 channels
+    if out is None:
+        return cv2.LUT(image, lut) if opencv else np.take(lut, image)
+    dest = resolve_out(out, image.shape, np.uint8)
+    if opencv and opencv_dst(dest) is not None:
+        return cv2.LUT(image, lut, dst=dest)  # element-wise, so in place is fine
+    np.take(lut, image, out=dest)  # buffered, so overlapping image and out is fine
+    return dest
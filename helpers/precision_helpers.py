@@ -0,0 +1,171 @@
+"""
+float32 versions of the chainable operations, for apply_operations(precision=...).
+
+Every function takes a float image on the 0-255 scale (float32, or float16
+when that is the storage precision) and returns float32 without clipping or
+rounding, so a chain of operations is quantized to uint8 exactly once, by
+quantize(), instead of after every step.
+
+The median filters and gamma are the exception: in float32 they run 10-300
+times slower than in uint8, so they read the image rounded and clipped to
+uint8 levels (_levels()) and use the uint8 median or a float-valued LUT.
+Gamma's output is still unrounded. The other point operations stay in
+float32 and, moving 4x the bytes, take 2-3x as long as in uint8.
+"""
+import cv2
+import numpy as np
+
+from helpers.backend_helpers import dispatch
+from helpers.brightness_helpers import get_brightness_factor
+from helpers.buffer_helpers import resolve_out
+from helpers.channel_swap_helpers import apply_channel_swap
+from helpers.color_matrix_helpers import GRAYSCALE_WEIGHTS, SEPIA_MATRIX
+from helpers.edge_helpers import sobel_gradients
+from helpers.gaussian_noise_helpers import cached_unit_noise
+from helpers.random_helpers import make_rng
+from helpers.salt_pepper_noise_helpers import add_salt_pepper_noise
+
+# Working precision of apply_operations: 'uint8' quantizes after every
+# operation, the float modes only once at the end. 'float16' computes in
+# float32 but stores the image between operations at half the size.
+PRECISIONS = ("uint8", "float32", "float16")
+
+
+def to_float(image):
+    """float32 view of the image on the 0-255 scale (no copy if it already is)"""
+    return image.astype(np.float32, copy=False)
+
+
+def store(image, precision):
+    """Cast an operation's float32 result to the storage precision"""
+    return image.astype(np.float16) if precision == "float16" else image
+
+
+def quantize(image, out=None):
+    """Round, clip and convert a float image to uint8 (the one quantization of a float chain)"""
+    dest = resolve_out(out, image.shape, np.uint8)
+    # OpenCV's saturating conversion rounds half to even like np.rint, in one pass
+    return cv2.add(image, 0.0, dst=dest, dtype=cv2.CV_8U)
+
+
+def _levels(image):
+    """The image rounded to uint8 levels, for the filters that only have a fast uint8 path"""
+    return image if image.dtype == np.uint8 else quantize(image)
+
+
+def _gray3(plane, channels):
+    return plane if channels == 1 else np.repeat(plane[..., None], channels, axis=2)
+
+
+def brightness(image, level=0):
+    return to_float(image) * np.float32(get_brightness_factor(level))
+
+
+def gamma(image, gamma=1.0):
+    if gamma <= 0:
+        raise ValueError(f"Gamma must be greater than 0, got {gamma}")
+    # Float-valued LUT over the rounded input levels: the output is not quantized
+    table = 255.0 * (np.arange(256) / 255.0) ** (1.0 / gamma)
+    return cv2.LUT(_levels(image), table.astype(np.float32))
+
+
+def contrast(image, alpha=1.0, beta=0.0):
+    result = to_float(image) * np.float32(alpha)
+    result += np.float32(128.0 * (1.0 - alpha) + beta)
+    return result
+
+
+def grayscale(image, channels=3):
+    weights = np.array(GRAYSCALE_WEIGHTS, dtype=np.float32)
+    plane = cv2.transform(to_float(image)[..., :3], weights[None, :])
+    return _gray3(plane.reshape(image.shape[:2]), channels)
+
+
+def gaussian_noise(image, intensity=0.1, seed=None, rng=None, reuse_field=False):
+    std_dev = np.float32(intensity * 255.0)
+    if reuse_field:
+        noise = cached_unit_noise(image.shape, 0 if seed is None else seed) * std_dev
+    else:
+        noise = make_rng(seed, rng).standard_normal(image.shape, dtype=np.float32)
+        noise *= std_dev
+    noise += image
+    return noise
+
+
+def salt_pepper(image, intensity=0.1, seed=None, rng=None, reuse_field=False):
+    # Setting pixels to 0 / 255 does not depend on the dtype
+    return add_salt_pepper_noise(to_float(image), intensity, seed, rng, reuse_field=reuse_field)
+
+
+def denoise(image, method="median", ksize=None, **kwargs):
+    """
+    remove_noise in float32. The median runs on the rounded uint8 levels
+    (OpenCV's float median is limited to ksize 3 and 5 and slower).
+    """
+    if method == "median":
+        return to_float(cv2.medianBlur(_levels(image), ksize or 5))
+    image = to_float(image)
+    if method == "gaussian":
+        ksize = ksize or (5, 5)
+        if isinstance(ksize, int):
+            ksize = (ksize, ksize)
+        return cv2.GaussianBlur(image, ksize, kwargs.get("sigma", 0))
+    if method == "bilateral":
+        return cv2.bilateralFilter(image, kwargs.get("d", 9), kwargs.get("sigma_color", 75),
+                                   kwargs.get("sigma_space", 75))
+    raise ValueError(f"Unknown noise removal method: {method}")
+
+
+def denoise_gaussian(image, sigma=1.0):
+    if sigma <= 0:
+        return to_float(image).copy()
+    return dispatch("gaussian", to_float(image), sigma)
+
+
+def denoise_median(image, kernel_size=3):
+    # On the rounded uint8 levels, where the fast median backends apply
+    return to_float(dispatch("median", _levels(image), kernel_size))
+
+
+def edges(image, sensitivity=1.0, direction="both", channels=3):
+    gray = grayscale(image, channels=1) if image.ndim == 3 else to_float(image)
+    gx, gy = sobel_gradients(gray)
+    if direction == "horizontal":
+        result = gx
+    elif direction == "vertical":
+        result = gy
+    else:
+        result = cv2.magnitude(gx, gy)
+    low, high = cv2.minMaxLoc(result)[:2]
+    if high <= low:
+        return _gray3(np.zeros(result.shape, dtype=np.float32), channels)
+    result -= low
+    result *= np.float32(255.0 * sensitivity / (high - low))
+    np.clip(result, 0, 255, out=result)  # part of the edge normalization, not a quantization
+    return _gray3(result, channels)
+
+
+def sharpen(image, ksize=5, sigma=1.0, amount=1.5, threshold=10):
+    if not isinstance(ksize, int):
+        ksize = ksize[0]
+    image = to_float(image)
+    mask = image - dispatch("gaussian", image, sigma, ksize, mode="mirror")
+    if threshold > 0:
+        low_contrast = mask < threshold
+        low_contrast &= mask > -threshold
+        mask[low_contrast] = 0
+    mask *= np.float32(amount)
+    mask += image
+    return mask
+
+
+def channel_swap(image, mode="rgb"):
+    return to_float(apply_channel_swap(image, mode))  # reorderings work for any dtype
+
+
+def sepia(image):
+    return cv2.transform(to_float(image)[..., :3], SEPIA_MATRIX.astype(np.float32))
+
+
+def invert(image):
+    return np.float32(255) - to_float(image)
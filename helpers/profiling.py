@@ -0,0 +1,231 @@
+"""
+Opt-in per-operation profiling.
+
+Public image operations are wrapped with @profiled. While profiling is off
+the wrapper is a single flag check before calling the function. While it
+is on, every call records wall time, CPU time, input megapixels and
+throughput, plus the tracemalloc peak when memory tracking is enabled.
+Python before 3.9 cannot reset that peak between calls; there peak_bytes is
+the memory a call still holds when it returns (e.g. its output), a lower
+bound of the real peak.
+
+    from helpers import profiling
+    profiling.enable(memory=True)
+    ...
+    print(profiling.prometheus_text())
+    profiling.export_jsonl("profile.jsonl")
+
+Setting ENHANCER_PROFILE=1 (or =memory) in the environment enables it at import.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+MAX_RECORDS = 10000
+
+_enabled = False
+_memory = False
+_started_tracing = False  # tracemalloc was started by enable(), so disable() stops it
+_can_reset_peak = hasattr(tracemalloc, "reset_peak")  # Python 3.9+
+_records = deque(maxlen=MAX_RECORDS)
+_totals = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(memory=False):
+    """Start recording calls; memory=True also tracks allocation peaks (slower)"""
+    global _enabled, _memory, _started_tracing
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+    elif not memory:
+        _stop_tracing()
+    _enabled = True
+
+
+def _stop_tracing():
+    """Stop tracemalloc if enable() started it (tracing started elsewhere is left alone)"""
+    global _started_tracing
+    if _started_tracing and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _started_tracing = False
+
+
+def disable():
+    """Stop recording (collected records are kept until reset())"""
+    global _enabled, _memory
+    _enabled = False
+    _stop_tracing()
+    _memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Drop all collected records and totals"""
+    with _lock:
+        _records.clear()
+        _totals.clear()
+
+
+class profile:
+    """
+    Context manager that enables profiling for the duration of a block and
+    then restores the previous state (including memory tracking)
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+
+    def __enter__(self):
+        self._previous = (_enabled, _memory)
+        enable(self.memory)
+        return self
+
+    def __exit__(self, *exc):
+        was_enabled, was_memory = self._previous
+        if was_enabled:
+            enable(was_memory)
+        else:
+            disable()
+
+
+def _megapixels(args, kwargs):
+    """Size of the first image argument, in megapixels"""
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, np.ndarray) and value.ndim >= 2:
+            return value.shape[0] * value.shape[1] / 1e6
+    return 0.0
+
+
+def _record(entry):
+    with _lock:
+        _records.append(entry)
+        total = _totals.setdefault(entry["op"], {
+            "calls": 0, "errors": 0, "wall_s": 0.0, "cpu_s": 0.0, "megapixels": 0.0, "peak_bytes": None,
+        })
+        total["calls"] += 1
+        total["errors"] += entry["error"]
+        total["wall_s"] += entry["wall_s"]
+        total["cpu_s"] += entry["cpu_s"]
+        total["megapixels"] += entry["megapixels"]
+        if entry["peak_bytes"] is not None:  # only outermost calls measure memory
+            total["peak_bytes"] = max(total["peak_bytes"] or 0, entry["peak_bytes"])
+
+
+def _peak_bytes(baseline):
+    """Traced memory peak of the call since baseline (the memory it kept, without reset_peak)"""
+    current, peak = tracemalloc.get_traced_memory()
+    return (peak if _can_reset_peak else current) - baseline
+
+
+def _call_profiled(name, func, args, kwargs):
+    depth = getattr(_local, "depth", 0)
+    # Nested profiled calls would reset the outer call's peak, so only the
+    # outermost call in each thread measures memory
+    track_memory = _memory and depth == 0 and tracemalloc.is_tracing()
+    if track_memory:
+        baseline = tracemalloc.get_traced_memory()[0]
+        if _can_reset_peak:
+            tracemalloc.reset_peak()
+    error = True
+    _local.depth = depth + 1
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        result = func(*args, **kwargs)
+        error = False
+        return result
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        _local.depth = depth
+        megapixels = _megapixels(args, kwargs)
+        _record({
+            "op": name,
+            "timestamp": time.time(),
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_bytes": _peak_bytes(baseline) if track_memory else None,
+            "megapixels": megapixels,
+            "mp_per_s": megapixels / wall if wall > 0 else 0.0,
+            "depth": depth,
+            "error": error,
+        })
+
+
+def profiled(func):
+    """Decorator: record the call when profiling is enabled, otherwise just call func"""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        return _call_profiled(name, func, args, kwargs)
+    return wrapper
+
+
+def records():
+    """Copy of the individual call records, oldest first (at most MAX_RECORDS)"""
+    with _lock:
+        return list(_records)
+
+
+def summary():
+    """Per-operation totals, slowest (by total wall time) first"""
+    with _lock:
+        totals = {op: dict(total) for op, total in _totals.items()}
+    rows = []
+    for op, total in totals.items():
+        calls = total["calls"]
+        rows.append({
+            "op": op,
+            **total,
+            "mean_ms": 1000.0 * total["wall_s"] / calls,
+            "mp_per_s": total["megapixels"] / total["wall_s"] if total["wall_s"] > 0 else 0.0,
+        })
+    return sorted(rows, key=lambda row: row["wall_s"], reverse=True)
+
+
+def export_jsonl(path, append=True):
+    """Write one JSON object per recorded call"""
+    with open(path, "a" if append else "w", encoding="utf-8") as f:
+        for entry in records():
+            f.write(json.dumps(entry) + "\n")
+
+
+def prometheus_text(prefix="enhancer_op"):
+    """Per-operation totals in the Prometheus text exposition format"""
+    metrics = [
+        ("calls_total", "counter", "Profiled calls", "calls"),
+        ("errors_total", "counter", "Profiled calls that raised", "errors"),
+        ("wall_seconds_total", "counter", "Wall-clock time spent in the operation", "wall_s"),
+        ("cpu_seconds_total", "counter", "Process CPU time spent in the operation", "cpu_s"),
+        ("megapixels_total", "counter", "Input megapixels processed", "megapixels"),
+        ("peak_bytes_max", "gauge", "Largest tracemalloc peak of one call", "peak_bytes"),
+    ]
+    rows = summary()
+    lines = []
+    for suffix, kind, help_text, key in metrics:
+        name = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for row in rows:
+            if row[key] is not None:
+                lines.append(f'{name}{{op="{row["op"]}"}} {row[key]}')
+    return "\n".join(lines) + "\n"
+
+
+_env = os.environ.get("ENHANCER_PROFILE", "").lower()
+if _env and _env not in ("0", "false", "no"):
+    enable(memory=_env == "memory")
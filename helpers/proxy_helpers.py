@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+# Filter parameters measured in pixels, rescaled for a proxy
+SPATIAL_SIGMAS = ("sigma", "sigma_space")
+SPATIAL_KERNELS = ("ksize", "kernel_size", "d")
+
+
+def decode_proxy(data, max_width):
+    """
+    Decode encoded image bytes at reduced resolution for previews.
+
+    JPEGs are downscaled by the decoder itself (draft() picks the DCT scale
+    1/2, 1/4 or 1/8 that stays at least max_width wide), other formats are
+    decoded in full and box-filtered by reduce(). The proxy is between
+    max_width and 2 * max_width wide; images that are not wider than
+    max_width are decoded in full.
+
+    Returns:
+        (image array, scale) where scale is proxy width / full width
+    """
+    pil_img = Image.open(io.BytesIO(data))
+    full_width, full_height = pil_img.size
+    if full_width <= max_width:
+        return np.array(pil_img), 1.0
+    pil_img.draft(pil_img.mode, (max_width, max(1, full_height * max_width // full_width)))
+    factor = pil_img.size[0] // max_width
+    if factor > 1:
+        pil_img = pil_img.reduce(factor)
+    return np.array(pil_img), pil_img.size[0] / full_width
+
+
+def scale_ksize(ksize, scale):
+    """Nearest odd kernel size (at least 1, i.e. no filtering) for an image scaled by scale"""
+    if isinstance(ksize, (tuple, list)):
+        return type(ksize)(scale_ksize(k, scale) for k in ksize)
+    if ksize <= 0:  # e.g. a bilateral diameter derived from sigma_space
+        return ksize
+    return max(1, 2 * int(round((ksize * scale - 1) / 2)) + 1)
+
+
+def scale_params(params, scale):
+    """
+    Filter parameters for an image scaled by scale, so that a blur, median or
+    sharpening on the proxy covers the same part of the picture as on the
+    full image. Sigmas scale linearly, kernel sizes to the nearest odd size.
+    Other parameters are returned unchanged.
+    """
+    if scale == 1.0:
+        return dict(params)
+    scaled = {}
+    for name, value in params.items():
+        if name in SPATIAL_SIGMAS:
+            value = value * scale
+        elif name in SPATIAL_KERNELS:
+            value = scale_ksize(value, scale)
+        scaled[name] = value
+    return scaled
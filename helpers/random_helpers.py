@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def make_rng(seed=None, rng=None):
+    """
+    Return the numpy Generator to draw from.
+
+    rng wins if given; otherwise a new Generator is seeded with seed (an int,
+    a SeedSequence or None for fresh OS entropy).
+    """
+    if rng is not None:
+        return rng
+    return np.random.default_rng(seed)
+
+
+def spawn_seed_sequences(seed, count):
+    """Independent, reproducible child seeds, e.g. one per batch worker or file"""
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def spawn_generators(seed, count):
+    """Independent, reproducible Generators spawned from one seed"""
+    return [np.random.default_rng(child) for child in spawn_seed_sequences(seed, count)]
@@ -1,32 +1,53 @@
+from functools import lru_cache
+
 import numpy as np
 
-def add_salt_pepper_noise(image, intensity=0.1):
+from helpers.buffer_helpers import resolve_out
+from helpers.profiling import profiled
+from helpers.random_helpers import make_rng
+
+
+@lru_cache(maxsize=4)
+def cached_unit_uniform(shape, seed=0):
+    """Uniform [0, 1) float32 plane for an image shape, memoized per (shape, seed)"""
+    field = np.random.default_rng(seed).random(shape, dtype=np.float32)
+    field.setflags(write=False)
+    return field
+
+
+@profiled
+def add_salt_pepper_noise(image, intensity=0.1, seed=None, rng=None, out=None, reuse_field=False):
     """
     Add salt and pepper noise to an image
     
     Args:
         image: Input image (numpy array)
         intensity: Noise intensity, controls the amount of noise (default: 0.1)
+        seed: Seed for a fresh numpy Generator (int or SeedSequence)
+        rng: numpy Generator to draw from (takes precedence over seed)
+        out: Optional array or BufferPool for the result; pass image itself for in-place
+        reuse_field: Threshold a cached uniform plane for (shape, seed) instead
+            of drawing new samples (seed defaults to 0)
     
     Returns:
         Image with added salt and pepper noise
     """
-    # Create a copy of the image
-    noisy_image = np.copy(image)
-
-    # Generate salt noise (white pixels)
-    salt_mask = np.random.random(size=image.shape[:2]) < (intensity / 2)
+    # One uniform draw per pixel: [0, p/2) -> salt, [p/2, p) -> pepper
+    shape = image.shape[:2]
+    if reuse_field:
+        u = cached_unit_uniform(shape, 0 if seed is None else seed)
+    else:
+        u = make_rng(seed, rng).random(shape, dtype=np.float32)
+    half = np.float32(intensity / 2)
+    salt_mask = u < half
+    pepper_mask = (u >= half) & (u < np.float32(intensity))
 
-    # Generate pepper noise (black pixels)
-    pepper_mask = np.random.random(size=image.shape[:2]) < (intensity / 2)
+    noisy_image = resolve_out(out, image.shape, image.dtype)
+    if noisy_image is not image:
+        np.copyto(noisy_image, image)
 
-    # Apply salt noise to all channels
-    if len(image.shape) > 2:  # Color image
-        for i in range(image.shape[2]):
-            noisy_image[salt_mask, i] = 255
-            noisy_image[pepper_mask, i] = 0
-    else:  # Grayscale image
-        noisy_image[salt_mask] = 255
-        noisy_image[pepper_mask] = 0
+    # A 2D mask selects whole pixels, so all channels are set at once
+    noisy_image[salt_mask] = 255
+    noisy_image[pepper_mask] = 0
 
-    return noisy_image
\ No newline at end of file
+    return noisy_image
@@ -0,0 +1,106 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from helpers.backend_helpers import dispatch
+from helpers.unsharp_mask_helpers import fused_combine
+
+# Detail layers (image-sized float32 arrays) a Sharpener keeps; the least
+# recently used high-pass or band set is dropped first
+SHARPENER_MAX_LAYERS = 4
+
+
+class Sharpener:
+    """
+    Unsharp masking of one image in stages.
+
+    The Gaussian blur, by far the most expensive step, runs once per
+    (ksize, sigma) and its high-pass image - blur is kept, so changing only
+    amount or threshold redoes nothing but the fused combine (one pass, see
+    fused_combine). sharpen() gives exactly the output of
+    filters.unsharp_mask with the same arguments.
+
+    sharpen_multiscale() boosts several detail bands at once. Its blurs form
+    one stack: each level blurs the previous one by the missing
+    sqrt(sigma_i² - sigma_(i-1)²), so the wide sigmas cost about as little
+    as the narrow ones.
+
+    Use one Sharpener per image; it holds a float32 copy of it plus at most
+    SHARPENER_MAX_LAYERS cached layers of the same size (more while a
+    larger band set is the only one cached).
+    """
+
+    def __init__(self, image):
+        self.image = image.astype(np.float32)
+        self.image.setflags(write=False)
+        self._layers = OrderedDict()  # key -> tuple of read-only float32 detail layers
+
+    @property
+    def nbytes(self):
+        """Memory held by the float image and the cached layers"""
+        return self.image.nbytes + sum(layer.nbytes for layers in self._layers.values()
+                                       for layer in layers)
+
+    def clear(self):
+        """Drop the cached high-pass layers and blur stacks"""
+        self._layers.clear()
+
+    def _cached(self, key, build):
+        layers = self._layers.get(key)
+        if layers is not None:
+            self._layers.move_to_end(key)
+            return layers
+        layers = tuple(build())
+        for layer in layers:
+            layer.setflags(write=False)
+        self._layers[key] = layers
+        while len(self._layers) > 1 and sum(map(len, self._layers.values())) > SHARPENER_MAX_LAYERS:
+            self._layers.popitem(last=False)
+        return layers
+
+    def high_pass(self, ksize=(5, 5), sigma=1.0):
+        """image - Gaussian blur (kernel height ksize[0], as in unsharp_mask), cached"""
+        kh = ksize if isinstance(ksize, int) else ksize[0]
+
+        def build():
+            blurred = dispatch("gaussian", self.image, sigma, kh, mode="mirror")
+            return [np.subtract(self.image, blurred, out=blurred)]
+        return self._cached(("high_pass", kh, sigma), build)[0]
+
+    def bands(self, sigmas):
+        """
+        Band-pass layers for strictly increasing sigmas: the first is image -
+        blur(sigmas[0]), each further one blur(sigmas[i-1]) - blur(sigmas[i]).
+        Their sum is the high-pass image - blur(sigmas[-1]). Cached.
+        """
+        sigmas = tuple(float(sigma) for sigma in sigmas)
+        if not sigmas or sigmas[0] <= 0 or any(b <= a for a, b in zip(sigmas, sigmas[1:])):
+            raise ValueError(f"Sigmas must be positive and strictly increasing, got {sigmas}")
+
+        def build():
+            layers = []
+            previous, previous_sigma = self.image, 0.0
+            for sigma in sigmas:
+                step = math.sqrt(sigma * sigma - previous_sigma * previous_sigma)
+                blurred = dispatch("gaussian", previous, step, mode="mirror")
+                layers.append(np.subtract(previous, blurred))
+                previous, previous_sigma = blurred, sigma
+            return layers
+        return self._cached(("bands", sigmas), build)
+
+    def sharpen(self, ksize=(5, 5), sigma=1.0, amount=1.0, threshold=0, out=None):
+        """
+        Same parameters and result as filters.unsharp_mask(image, ...);
+        out: optional uint8 destination or BufferPool.
+        """
+        return fused_combine(self.image, [self.high_pass(ksize, sigma)], [amount], threshold, out)
+
+    def sharpen_multiscale(self, sigmas=(1.0, 2.0, 4.0), amounts=(1.0, 0.5, 0.25), threshold=0, out=None):
+        """
+        Multi-scale unsharp masking: image + sum(amounts[i] * band i) for the
+        bands() of sigmas, each thresholded at threshold, in one fused pass.
+        """
+        if len(amounts) != len(sigmas):
+            raise ValueError(f"Got {len(amounts)} amounts for {len(sigmas)} sigmas")
+        return fused_combine(self.image, self.bands(sigmas), amounts, threshold, out)
@@ -0,0 +1,165 @@
+import itertools
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from helpers.profiling import profiled
+
+STACK_METHODS = ("mean", "median", "sigma_clip")
+
+# Working bytes per stacked sample while reducing a band (the uint8 samples
+# plus the float32 and mask temporaries of the clipping passes)
+BYTES_PER_SAMPLE = 16
+
+
+class StackAccumulator:
+    """
+    Running per-pixel mean and variance of a stream of equally sized uint8
+    images (Welford's update), so N frames cost two float32 images of
+    memory, or one with variance=False (mean only).
+    """
+
+    def __init__(self, variance=True):
+        self.count = 0
+        self.track_variance = variance
+        self._mean = None
+        self._m2 = None
+
+    def add(self, image):
+        """Fold one more image into the running statistics"""
+        if image.dtype != np.uint8:
+            raise TypeError(f"Stacking needs uint8 images, got {image.dtype}")
+        if self._mean is None:
+            self._mean = np.zeros(image.shape, dtype=np.float32)
+            if self.track_variance:
+                self._m2 = np.zeros(image.shape, dtype=np.float32)
+        elif image.shape != self._mean.shape:
+            raise ValueError(f"Image shape {image.shape} does not match the stack {self._mean.shape}")
+
+        self.count += 1
+        delta = image - self._mean            # x - old mean
+        self._mean += delta / self.count
+        if self.track_variance:
+            delta *= image - self._mean       # (x - old mean) * (x - new mean)
+            self._m2 += delta
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def variance(self):
+        """Population variance (zeros until two images were added)"""
+        if not self.track_variance:
+            raise ValueError("Variance is not tracked by this accumulator (variance=False)")
+        if self.count < 2:
+            return np.zeros_like(self._mean)
+        return self._m2 / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+def to_uint8(values):
+    """Round and saturate float statistics back to an 8-bit image"""
+    return np.clip(np.round(values), 0, 255).astype(np.uint8)
+
+
+def band_rows(count, row_bytes, memory_mb):
+    """
+    How many rows of all `count` frames fit in the memory budget at once.
+    Raises ValueError when not even one row does.
+    """
+    budget = memory_mb * 1024 * 1024
+    row_cost = count * row_bytes * BYTES_PER_SAMPLE
+    if row_cost > budget:
+        raise ValueError(f"memory_mb={memory_mb} is too small for {count} frames: one row of all "
+                         f"of them needs {row_cost / (1024 * 1024):.1f} MB")
+    return int(budget // row_cost)
+
+
+def _sigma_clip_band(band, mean, std, kappa, iterations):
+    """Mean of each pixel's samples within kappa standard deviations, iterated"""
+    samples = band.astype(np.float32)
+    keep = np.ones(samples.shape, dtype=bool)
+    for _ in range(iterations):
+        keep = np.abs(samples - mean) <= kappa * std
+        kept = np.maximum(keep.sum(axis=0), 1)
+        mean = np.where(keep, samples, 0).sum(axis=0) / kept
+        std = np.sqrt(np.where(keep, (samples - mean) ** 2, 0).sum(axis=0) / kept)
+    # Pixels where everything was rejected fall back to their plain mean
+    return np.where(keep.any(axis=0), mean, samples.mean(axis=0))
+
+
+@profiled
+def stack_images(images, method="mean", memory_mb=512, kappa=3.0, iterations=3, workdir=None):
+    """
+    Merge aligned exposures into one image.
+
+    Args:
+        images: Iterable of equally sized uint8 images (e.g. a generator that
+            loads them one at a time); it is consumed exactly once
+        method: 'mean', 'median' or 'sigma_clip' (mean without outliers)
+        memory_mb: Budget for the per-band working set of 'median' and 'sigma_clip'
+        kappa: Rejection threshold in standard deviations ('sigma_clip')
+        iterations: Clipping passes ('sigma_clip')
+        workdir: Directory for the temporary on-disk stack ('median',
+            'sigma_clip'; default: the system temp directory)
+
+    Returns:
+        uint8 image
+
+    'mean' keeps only the running mean. The other methods write every frame
+    in full to a temporary file in workdir (N x the frame size on disk, e.g.
+    2.4 GB for 100 frames of 8 MP color) and memory-map it while
+    accumulating the mean and variance, then reduce it in row bands sized by
+    memory_mb, so peak memory does not grow with the number of frames. A
+    ValueError is raised if a single row of all frames exceeds memory_mb.
+    """
+    if method not in STACK_METHODS:
+        raise ValueError(f"Unknown stacking method: {method}")
+
+    if method == "mean":
+        accumulator = StackAccumulator(variance=False)
+        for image in images:
+            accumulator.add(image)
+        if not accumulator.count:
+            raise ValueError("No images to stack")
+        return to_uint8(accumulator.mean)
+
+    accumulator = StackAccumulator()
+    images = iter(images)
+    first = next(images, None)
+    if first is None:
+        raise ValueError("No images to stack")
+
+    tmp_dir = tempfile.mkdtemp(prefix="stack_", dir=workdir)
+    try:
+        spill_path = os.path.join(tmp_dir, "frames.u8")
+        with open(spill_path, "wb") as spill:  # frame count need not be known up front
+            for image in itertools.chain([first], images):
+                accumulator.add(image)
+                spill.write(np.ascontiguousarray(image).data)
+
+        count = accumulator.count
+        stack = np.memmap(spill_path, dtype=np.uint8, mode="r", shape=(count,) + first.shape)
+        height = first.shape[0]
+        row_bytes = first[0].nbytes
+        rows = band_rows(count, row_bytes, memory_mb)
+
+        result = np.empty(first.shape, dtype=np.uint8)
+        mean, std = accumulator.mean, accumulator.std
+        for top in range(0, height, rows):
+            band = np.asarray(stack[:, top:top + rows])  # reads just these rows of every frame
+            if method == "median":
+                result[top:top + rows] = to_uint8(np.median(band, axis=0))
+            else:
+                result[top:top + rows] = to_uint8(
+                    _sigma_clip_band(band, mean[top:top + rows], std[top:top + rows], kappa, iterations))
+        del stack
+        return result
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
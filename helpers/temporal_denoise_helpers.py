@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+TEMPORAL_METHODS = ("mean", "ema", "median")
+
+# Up to this many frames the median uses a sorting network of element-wise
+# min/max (contiguous, vectorized); beyond it np.median is cheaper
+MEDIAN_NETWORK_MAX = 15
+
+
+def median_of_frames(frames):
+    """Per-pixel median of a few uint8 frames (even counts round halves up)"""
+    if len(frames) > MEDIAN_NETWORK_MAX:
+        return np.round(np.median(frames, axis=0)).astype(np.uint8)
+    planes = list(frames)
+    n = len(planes)
+    if n == 1:
+        return planes[0].copy()  # never hand out a view of the caller's buffer
+    for step in range(n):  # odd-even transposition sort
+        for i in range(step % 2, n - 1, 2):
+            low, high = planes[i], planes[i + 1]
+            planes[i], planes[i + 1] = np.minimum(low, high), np.maximum(low, high)
+    if n % 2:
+        return planes[n // 2]
+    total = planes[n // 2 - 1].astype(np.uint16) + planes[n // 2] + 1
+    return (total >> 1).astype(np.uint8)
+
+
+class TemporalDenoiser:
+    """
+    Denoise a frame sequence using the frames that came before.
+
+    - 'mean': average of the last `window` frames. An int32 running sum is
+      updated by adding the new frame and subtracting the one leaving the
+      ring buffer, so each frame costs O(1) per pixel whatever the window.
+    - 'ema': exponential moving average with weight `alpha` for the new
+      frame (no buffer needed).
+    - 'median': per-pixel median of the last `window` frames; robust to
+      flicker and passing objects but O(window²) per pixel for small windows.
+
+    Feed frames in order with update(); call reset() on a scene cut.
+    """
+
+    def __init__(self, method="mean", window=5, alpha=0.2):
+        if method not in TEMPORAL_METHODS:
+            raise ValueError(f"Unknown temporal method: {method}")
+        if window < 1:
+            raise ValueError(f"Window must be at least 1, got {window}")
+        if not 0 < alpha <= 1:
+            raise ValueError(f"Alpha must be in (0, 1], got {alpha}")
+        self.method = method
+        self.window = window
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        """Forget all previous frames"""
+        self._ring = None  # (window, H, W[, C]) uint8 ring buffer
+        self._acc = None   # running sum (mean) or running average (ema)
+        self._next = 0     # ring slot the next frame goes into
+        self.count = 0     # frames currently in the window
+
+    def _start(self, frame):
+        if self.method == "ema":
+            self._acc = frame.astype(np.float32)
+            return
+        self._ring = np.empty((self.window,) + frame.shape, dtype=np.uint8)
+        if self.method == "mean":
+            self._acc = np.zeros(frame.shape, dtype=np.int32)
+
+    def update(self, frame):
+        """
+        Add the next frame and return its denoised version (uint8, same shape).
+        The first frames are averaged over however many have been seen so far.
+        """
+        if frame.dtype != np.uint8:
+            raise TypeError(f"Temporal denoising needs uint8 frames, got {frame.dtype}")
+        if self._ring is None and self._acc is None:
+            self._start(frame)
+        expected = self._acc.shape if self._acc is not None else self._ring.shape[1:]
+        if frame.shape != expected:
+            raise ValueError(f"Frame shape {frame.shape} does not match the sequence {expected}")
+
+        if self.method == "ema":
+            if self.count:
+                cv2.accumulateWeighted(frame, self._acc, self.alpha)
+            self.count = 1
+            return cv2.convertScaleAbs(self._acc)  # rounds and saturates
+
+        slot = self._ring[self._next]
+        if self.method == "mean":
+            if self.count == self.window:
+                np.subtract(self._acc, slot, out=self._acc)  # frame leaving the window
+            np.add(self._acc, frame, out=self._acc)
+        slot[...] = frame
+        self._next = (self._next + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+        if self.method == "mean":
+            return cv2.convertScaleAbs(self._acc, alpha=1.0 / self.count)
+        frames = self._ring if self.count == self.window else self._ring[:self.count]
+        return median_of_frames(frames)
+
+
+def temporal_denoise(frames, method="mean", window=5, alpha=0.2, spatial=None):
+    """
+    Denoise an iterable of frames lazily, one output per input frame.
+
+    Args:
+        frames: Iterable of uint8 frames of equal shape
+        method: 'mean', 'ema' or 'median'
+        window: Frames per window ('mean' and 'median')
+        alpha: Weight of the newest frame ('ema')
+        spatial: Optional function applied to each frame first, e.g.
+            lambda f: remove_noise(f, "median", ksize=3)
+    """
+    denoiser = TemporalDenoiser(method, window, alpha)
+    for frame in frames:
+        if spatial is not None:
+            frame = spatial(frame)
+        yield denoiser.update(frame)
@@ -1,4 +1,17 @@
+from functools import lru_cache
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from helpers.buffer_helpers import resolve_out, write_out
+from helpers.fft_helpers import fft_convolve, should_use_fft
+from helpers.profiling import profiled
+
+# The unsharp combine runs over row strips of about this many float32
+# bytes, so its intermediate steps stay in the CPU cache instead of
+# streaming whole-image temporaries through memory
+COMBINE_STRIP_BYTES = 256 * 1024
+
 
 def gaussian_kernel(ksize=5, sigma=1.0):
     """
@@ -6,40 +19,219 @@ def gaussian_kernel(ksize=5, sigma=1.0):
     ksize: odd integer > 1, kernel width & height
     sigma: standard deviation of the Gaussian
     """
+    gauss1d = gaussian_kernel_1d(ksize, sigma)
+    # Outer product to get 2D kernel
+    kernel = np.outer(gauss1d, gauss1d)
+    return kernel
+
+
+@lru_cache(maxsize=64)
+def gaussian_kernel_1d(ksize=5, sigma=1.0):
+    """
+    Create a normalized 1D Gaussian of length ksize (memoized, read-only).
+    """
     # 1D coordinates centered at zero
     ax = np.linspace(-(ksize // 2), ksize // 2, ksize)
     gauss1d = np.exp(-0.5 * (ax / sigma)**2)
     gauss1d /= gauss1d.sum()              # normalize
-    # Outer product to get 2D kernel
-    kernel = np.outer(gauss1d, gauss1d)
+    gauss1d.setflags(write=False)
+    return gauss1d
+
+
+@lru_cache(maxsize=64)
+def cached_gaussian_kernel(ksize=5, sigma=1.0):
+    """
+    Memoized gaussian_kernel keyed by (ksize, sigma).
+    The returned kernel is shared between callers, so it is read-only.
+    """
+    kernel = gaussian_kernel(ksize, sigma)
+    kernel.setflags(write=False)
     return kernel
 
 
-def convolve2d(image, kernel):
+def separable_factors(kernel, tol=1e-6):
+    """
+    Split a 2D kernel into (column, row) 1D factors if it is separable.
+
+    A kernel is separable when it has rank 1, i.e. kernel == outer(col, row).
+    Returns None for non-separable kernels.
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim != 2:
+        return None
+
+    u, s, vt = np.linalg.svd(kernel)
+    if s[0] == 0 or s[1:].sum() > tol * s[0]:
+        return None
+    scale = np.sqrt(s[0])
+    return u[:, 0] * scale, vt[0] * scale
+
+
+def _pad_reflect(image, pad_h, pad_w, mode='reflect'):
+    """Reflect-pad the spatial axes of an H×W×C image."""
+    return np.pad(image,
+                  ((pad_h, pad_h), (pad_w, pad_w), (0, 0)),
+                  mode=mode)
+
+
+def _weighted_sum(terms, shape, out=None):
+    """
+    float32 sum of weight * view over (weight, view) terms, using one scratch
+    buffer instead of a temporary per term.
+    """
+    out = resolve_out(out, shape, np.float32)
+    scratch = None
+    for weight, view in terms:
+        if scratch is None:
+            np.multiply(view, np.float32(weight), out=out)
+            scratch = np.empty(shape, dtype=np.float32)
+        else:
+            np.multiply(view, np.float32(weight), out=scratch)
+            out += scratch
+    if scratch is None:
+        out.fill(0)
+    return out
+
+
+def convolve_separable(image, col, row, pad_mode='reflect'):
+    """
+    Convolve an H×W×C float image with the separable kernel outer(col, row)
+    as two vectorized 1D passes (vertical, then horizontal).
+    pad_mode is the numpy pad mode for the borders.
+    """
+    h, w = image.shape[:2]
+    kh, kw = len(col), len(row)
+    padded = _pad_reflect(image, kh // 2, kw // 2, pad_mode)
+
+    # Vertical pass: H×(W+2*pad_w)×C
+    tmp = _weighted_sum(((weight, padded[i:i + h]) for i, weight in enumerate(col) if weight),
+                        (h,) + padded.shape[1:])
+
+    # Horizontal pass: H×W×C
+    return _weighted_sum(((weight, tmp[:, j:j + w]) for j, weight in enumerate(row) if weight),
+                         image.shape)
+
+
+def convolve_windowed(image, kernel, pad_mode='reflect'):
+    """
+    Convolve an H×W×C float image with an arbitrary 2D kernel using a
+    strided sliding-window view: one vectorized multiply-add per kernel tap,
+    no per-pixel Python loop and no window copies.
+    """
+    kh, kw = kernel.shape
+    padded = _pad_reflect(image, kh // 2, kw // 2, pad_mode)
+    windows = sliding_window_view(padded, (kh, kw), axis=(0, 1))
+
+    return _weighted_sum(((kernel[i, j], windows[..., i, j])
+                          for i in range(kh) for j in range(kw) if kernel[i, j]),
+                         image.shape)
+
+
+@profiled
+def convolve2d(image, kernel, method='auto', out=None):
     """
     Convolve a 2D (H×W) or 3D (H×W×C) image with a 2D kernel.
-    Pads edges with reflect mode.
+    Pads edges with reflect mode. out: optional float32 destination or BufferPool.
+
+    Separable kernels (e.g. every gaussian_kernel) run as two 1D passes,
+    anything else falls back to a sliding-window evaluation. With
+    method='auto' large kernels switch to the FFT backend; 'direct' and
+    'fft' force one backend.
     """
+    if method not in ('auto', 'direct', 'fft'):
+        raise ValueError(f"Unknown convolution method: {method}")
+
     if image.ndim == 2:
         image = image[:, :, None]   # make H×W×1 for uniformity
 
-    h, w, channels = image.shape
-    kh, kw = kernel.shape
-    pad_h, pad_w = kh // 2, kw // 2
+    kernel = np.asarray(kernel)
+    image = image.astype(np.float32, copy=False)
+
+    factors = separable_factors(kernel)
+    if method == 'auto':
+        use_fft = should_use_fft(image.shape, kernel.shape, factors is not None)
+    else:
+        use_fft = method == 'fft'
+
+    if use_fft:
+        result = fft_convolve(image, kernel, pad_mode='reflect', correlate=True)
+    elif factors is not None:
+        result = convolve_separable(image, *factors)
+    else:
+        result = convolve_windowed(image, kernel)
+
+    return write_out(result.squeeze(), out)
 
-    # Pad each channel
-    padded = np.pad(image,
-                    ((pad_h, pad_h), (pad_w, pad_w), (0, 0)),
-                    mode='reflect')
 
-    # Prepare output
-    out = np.zeros_like(image, dtype=np.float32)
+def _row_strips(shape):
+    """Slices of about COMBINE_STRIP_BYTES (in float32) along the first axis, and the strip shape"""
+    row_bytes = 4 * int(np.prod(shape[1:], dtype=np.int64))
+    rows = max(1, COMBINE_STRIP_BYTES // max(row_bytes, 1))
+    return [slice(y, y + rows) for y in range(0, shape[0], rows)], (rows,) + tuple(shape[1:])
 
-    # Slide kernel
-    for y in range(h):
-        for x in range(w):
-            for c in range(channels):
-                region = padded[y:y+kh, x:x+kw, c]
-                out[y, x, c] = np.sum(region * kernel)
 
-    return out.squeeze()
\ No newline at end of file
+def _add_detail(acc, detail, amount, threshold, scratch, keep):
+    """acc += amount * detail, leaving out values with |detail| < threshold"""
+    if threshold > 0:
+        np.abs(detail, out=scratch)
+        np.greater_equal(scratch, threshold, out=keep)
+        np.multiply(detail, np.float32(amount), out=scratch)
+        np.multiply(scratch, keep, out=scratch)
+    else:
+        np.multiply(detail, np.float32(amount), out=scratch)
+    acc += scratch
+
+
+def _combine(img_float, layers, amounts, threshold, out):
+    """
+    Shared loop of fused_combine() and combine_unsharp(). layers(rows, buffer)
+    returns the detail layers of a strip, using buffer for computed ones.
+    """
+    dest = resolve_out(out, img_float.shape, np.uint8)
+    strips, strip_shape = _row_strips(img_float.shape)
+    acc = np.empty(strip_shape, dtype=np.float32)
+    detail = np.empty(strip_shape, dtype=np.float32)
+    scratch = np.empty(strip_shape, dtype=np.float32)
+    keep = np.empty(strip_shape, dtype=bool) if threshold > 0 else None
+    for rows in strips:
+        image_rows = img_float[rows]
+        n = image_rows.shape[0]
+        np.copyto(acc[:n], image_rows)
+        for layer, amount in zip(layers(rows, detail[:n]), amounts):
+            _add_detail(acc[:n], layer, amount, threshold, scratch[:n],
+                        None if keep is None else keep[:n])
+        np.clip(acc[:n], 0, 255, out=acc[:n])
+        np.copyto(dest[rows], acc[:n], casting='unsafe')
+    return dest
+
+
+@profiled
+def fused_combine(img_float, details, amounts, threshold=0, out=None):
+    """
+    uint8 result of img_float + sum(amount * detail), clipped, where details
+    are high-pass (or band-pass) layers of img_float and values with
+    |detail| < threshold are left out.
+
+    All steps run strip by strip in small scratch buffers, i.e. in one pass
+    over the inputs and the output. out: optional uint8 destination or BufferPool.
+    """
+    return _combine(img_float, lambda rows, _: [detail[rows] for detail in details],
+                    amounts, threshold, out)
+
+
+@profiled
+def combine_unsharp(img_float, blurred, amount=1.0, threshold=0, out=None):
+    """
+    Second half of unsharp masking: add the scaled high-pass back.
+
+    img_float: float32 original
+    blurred: Gaussian blur of img_float
+    out: optional uint8 destination or BufferPool
+    Returns the sharpened uint8 image.
+
+    Fused like fused_combine(): the mask img_float - blurred only ever
+    exists one strip at a time.
+    """
+    return _combine(img_float,
+                    lambda rows, buffer: [np.subtract(img_float[rows], blurred[rows], out=buffer)],
+                    (amount,), threshold, out)
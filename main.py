@@ -1,12 +1,12 @@
 import os
 import time
-from filters import apply_brightness, apply_all_brightness_levels, apply_grayscale, add_gaussian_noise, add_salt_pepper_noise, apply_edge_detection,unsharp_mask,apply_channel_swap
+from filters import apply_brightness, iter_brightness_levels, apply_grayscale, add_gaussian_noise, add_salt_pepper_noise, apply_edge_detection,unsharp_mask,apply_channel_swap
 from helpers.brightness_helpers import get_brightness_description
 from noiseRemovalFilter import remove_noise
 from InvertColorFilter import apply_invert
 import utils
 from helpers.noise_filter_helper import smooth_image_with_gaussian_blur, remove_noise_with_median_filter
-from Quantitative_Proof import sobel_gradient_energy,variance_of_laplacian
+from Quantitative_Proof import focus_metrics
 
 def load_image():
     """Prompt user for image path and load it"""
@@ -49,13 +49,13 @@ def apply_brightness_filter(current_image, output_dir):
 
 def save_all_brightness_levels(current_image, output_dir):
     """Save all brightness adjustment levels"""
-    results = apply_all_brightness_levels(current_image)
-
-    for level, image in results.items():
-        filename = f"brightness_{level:+d}.jpg"
-        output_path = os.path.join(output_dir, filename)
-        utils.save_image(image, output_path)
+    # Each level is encoded while the next one is computed; only a few are in memory
+    levels = ((image, os.path.join(output_dir, f"brightness_{level:+d}.jpg"))
+              for level, image in iter_brightness_levels(current_image))
+    failed = utils.save_images(levels, workers=2)
 
+    for path in failed:
+        print(f"Could not write {path}")
     print(f"All brightness levels saved to {output_dir}/")
 
 
@@ -268,12 +268,10 @@ def apply_sharpen(current_image, output_dir):
     utils.save_image(sharpened, sharp_path)
 
     # Quantitative proof
-    fm_orig = variance_of_laplacian(current_image)
-    fm_sharp = variance_of_laplacian(sharpened)
-    se_orig = sobel_gradient_energy(current_image)
-    se_sharp = sobel_gradient_energy(sharpened)
-    print(f" Variance of Laplacian • original: {fm_orig:.2f}, sharpened: {fm_sharp:.2f}")
-    print(f" Sobel energy          • original: {se_orig:.0f}, sharpened: {se_sharp:.0f}")
+    orig = focus_metrics(current_image)
+    sharp = focus_metrics(sharpened)
+    print(f" Variance of Laplacian • original: {orig['laplacian_var']:.2f}, sharpened: {sharp['laplacian_var']:.2f}")
+    print(f" Sobel energy          • original: {orig['sobel_energy']:.0f}, sharpened: {sharp['sobel_energy']:.0f}")
 
     # 3) Display comparison
     utils.display_comparison(current_image, sharpened,
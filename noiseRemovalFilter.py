@@ -1,24 +1,33 @@
 import cv2
+from helpers.buffer_helpers import opencv_dst, resolve_out, write_out
+from helpers.profiling import profiled
 
-def remove_noise(image, method="median", **kwargs):
+@profiled
+def remove_noise(image, method="median", out=None, **kwargs):
     """
     Remove noise from the image using the specified method.
     Available methods: 'median', 'gaussian', 'bilateral'
+    out: optional destination array or BufferPool (may be the image itself)
     """
+    dest = None if out is None else resolve_out(out, image.shape, image.dtype)
+    # The bilateral filter cannot run in place
+    dst = opencv_dst(dest, image if method == "bilateral" else None)
+
     if method == "median":
         ksize = kwargs.get("ksize", 5)
-        return cv2.medianBlur(image, ksize)
-    
+        result = cv2.medianBlur(image, ksize, dst=dst)
+
     elif method == "gaussian":
         ksize = kwargs.get("ksize", (5, 5))
         sigma = kwargs.get("sigma", 0)
-        return cv2.GaussianBlur(image, ksize, sigma)
-    
+        result = cv2.GaussianBlur(image, ksize, sigma, dst=dst)
+
     elif method == "bilateral":
         d = kwargs.get("d", 9)
         sigma_color = kwargs.get("sigma_color", 75)
         sigma_space = kwargs.get("sigma_space", 75)
-        return cv2.bilateralFilter(image,d,sigma_color,sigma_space)
-    
+        result = cv2.bilateralFilter(image,d,sigma_color,sigma_space, dst=dst)
+
     else:
         raise ValueError(f"Unknown noise removal method: {method}")
+    return write_out(result, dest)
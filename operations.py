@@ -0,0 +1,171 @@
+# Registry of named filter operations shared by the non-interactive entry points
+import ast
+
+from filters import (
+    apply_brightness, apply_gamma, apply_contrast, apply_grayscale, add_gaussian_noise, add_salt_pepper_noise,
+    apply_edge_detection, unsharp_mask, apply_channel_swap, apply_sepia
+)
+from noiseRemovalFilter import remove_noise
+from InvertColorFilter import apply_invert
+from helpers.noise_filter_helper import smooth_image_with_gaussian_blur, remove_noise_with_median_filter
+from helpers import precision_helpers
+from helpers.precision_helpers import PRECISIONS
+
+
+def _denoise(image, method="median", ksize=None, **kwargs):
+    """remove_noise wrapper that accepts a single int for the gaussian kernel size"""
+    if ksize is not None:
+        if method == "gaussian" and isinstance(ksize, int):
+            ksize = (ksize, ksize)
+        kwargs["ksize"] = ksize
+    return remove_noise(image, method=method, **kwargs)
+
+
+def _sharpen(image, ksize=5, sigma=1.0, amount=1.5, threshold=10, out=None):
+    """unsharp_mask wrapper taking a single odd kernel size (same defaults as the CLI)"""
+    if isinstance(ksize, int):
+        ksize = (ksize, ksize)
+    return unsharp_mask(image, ksize=ksize, sigma=sigma, amount=amount, threshold=threshold, out=out)
+
+
+OPERATIONS = {
+    "brightness": apply_brightness,
+    "gamma": apply_gamma,
+    "contrast": apply_contrast,
+    "grayscale": apply_grayscale,
+    "gaussian_noise": add_gaussian_noise,
+    "salt_pepper": add_salt_pepper_noise,
+    "denoise": _denoise,
+    "denoise_gaussian": smooth_image_with_gaussian_blur,
+    "denoise_median": remove_noise_with_median_filter,
+    "edges": apply_edge_detection,
+    "sharpen": _sharpen,
+    "channel_swap": apply_channel_swap,
+    "sepia": apply_sepia,
+    "invert": apply_invert,
+}
+
+
+# float32 counterparts used when apply_operations runs in a float precision
+FLOAT_OPERATIONS = {name: getattr(precision_helpers, name) for name in OPERATIONS}
+
+
+def _parse_value(text):
+    """Turn '2', '1.5', '(5, 5)' or 'median' into the matching Python value"""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def _split_params(text):
+    """Split 'a=1,b=(5, 5)' on the commas that are not inside brackets"""
+    parts, depth, current = [], 0, ""
+    for char in text:
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_operation(spec):
+    """
+    Parse an operation spec of the form 'name' or 'name:key=value,key=value'.
+
+    Examples:
+        'grayscale'
+        'brightness:level=2'
+        'denoise:method=gaussian,ksize=5,sigma=0'
+
+    Returns:
+        (name, params) tuple
+    """
+    name, _, arg_text = spec.partition(":")
+    name = name.strip()
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {name} (available: {', '.join(OPERATIONS)})")
+
+    params = {}
+    for item in _split_params(arg_text):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid parameter '{item}' in operation '{spec}', expected key=value")
+        params[key.strip()] = _parse_value(value.strip())
+    return name, params
+
+
+def operations_from_json(chain):
+    """
+    Build an operation list from decoded JSON.
+
+    Each item is either a spec string ('brightness:level=2') or a
+    [name, {params}] pair; JSON lists in params become tuples (e.g. ksize).
+
+    Returns:
+        Ordered list of (name, params)
+    """
+    if not isinstance(chain, list):
+        raise ValueError("Operation chain must be a JSON list")
+    operations = []
+    for item in chain:
+        if isinstance(item, str):
+            operations.append(parse_operation(item))
+            continue
+        if not (isinstance(item, list) and len(item) == 2 and isinstance(item[1], dict)):
+            raise ValueError(f"Invalid operation {item!r}, expected 'spec' or [name, {{params}}]")
+        name, params = item
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name} (available: {', '.join(OPERATIONS)})")
+        operations.append((name, {key: tuple(value) if isinstance(value, list) else value
+                                  for key, value in params.items()}))
+    return operations
+
+
+# Operations that draw random numbers and accept an rng= Generator
+RANDOM_OPERATIONS = {"gaussian_noise", "salt_pepper"}
+
+
+def apply_operations(image, operations, rng=None, pool=None, precision="uint8", quantize=True):
+    """
+    Apply an ordered list of (name, params) operations to an image.
+    rng (a numpy Generator) is handed to the noise operations for reproducible runs.
+
+    With a BufferPool every operation writes to a pooled buffer and each
+    intermediate goes back to the pool once the next operation has read it,
+    so same-sized images stop allocating after the first one. The input is
+    never modified; release the returned image to the pool when done with it.
+
+    precision='float32' keeps the image in float32 (0-255 scale) from the
+    first operation to the last and clips and rounds it to uint8 only once;
+    'float16' does the same but stores the image between operations at half
+    the size. quantize=False returns the float result instead (to continue
+    the chain later). The default 'uint8' quantizes after every operation.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (available: {', '.join(PRECISIONS)})")
+    if precision != "uint8":
+        for name, params in operations:
+            if rng is not None and name in RANDOM_OPERATIONS:
+                params = dict(params, rng=rng)
+            image = precision_helpers.store(FLOAT_OPERATIONS[name](image, **params), precision)
+        return precision_helpers.quantize(image, pool) if quantize else image
+
+    source = image
+    for name, params in operations:
+        if rng is not None and name in RANDOM_OPERATIONS:
+            params = dict(params, rng=rng)
+        if pool is None:
+            image = OPERATIONS[name](image, **params)
+            continue
+        result = OPERATIONS[name](image, out=pool, **params)
+        if image is not source and image is not result:
+            pool.release(image)
+        image = result
+    return image
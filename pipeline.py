@@ -0,0 +1,179 @@
+"""
+Streaming decode -> filter -> encode pipeline.
+
+Each stage runs in its own pool of threads and the stages are joined by
+bounded queues, so disk I/O (cv2.imread / cv2.imwrite release the GIL)
+overlaps with filtering. A full queue blocks the stage in front of it
+(backpressure), which keeps memory flat regardless of the number of inputs.
+"""
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+import utils
+from helpers.buffer_helpers import BufferPool
+from operations import apply_operations
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class StageStats:
+    """Per-stage counters used to find the bottleneck stage"""
+
+    def __init__(self, name, threads):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, failed=False):
+        with self._lock:
+            self.busy_seconds += seconds
+            if failed:
+                self.failures += 1
+            else:
+                self.items += 1
+
+    def utilization(self, elapsed):
+        """Fraction of the stage's thread time spent working (0-1)"""
+        if elapsed <= 0:
+            return 0.0
+        return self.busy_seconds / (elapsed * self.threads)
+
+    def as_dict(self, elapsed):
+        return {
+            "threads": self.threads,
+            "items": self.items,
+            "failures": self.failures,
+            "busy_seconds": self.busy_seconds,
+            "utilization": self.utilization(elapsed),
+        }
+
+
+def _stage_worker(func, in_q, out_q, stats, errors):
+    """Pull items from in_q, apply func and push results to out_q until _DONE"""
+    while True:
+        item = in_q.get()
+        if item is _DONE:
+            return
+        start = time.perf_counter()
+        try:
+            result = func(item)
+        except Exception as e:  # keep the stream flowing, report at the end
+            stats.record(time.perf_counter() - start, failed=True)
+            errors.append((item[0], f"{stats.name}: {type(e).__name__}: {e}"))
+            continue
+        stats.record(time.perf_counter() - start)
+        if out_q is not None:
+            out_q.put(result)  # blocks while the next stage is behind
+
+
+def _start_stage(name, func, in_q, out_q, threads, downstream_threads, errors):
+    """
+    Start a stage's worker threads plus a closer that, once they all finish,
+    sends one _DONE per worker of the next stage.
+    """
+    stats = StageStats(name, threads)
+    workers = [threading.Thread(target=_stage_worker, args=(func, in_q, out_q, stats, errors),
+                                name=f"{name}-{i}", daemon=True)
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    def close():
+        for worker in workers:
+            worker.join()
+        for _ in range(downstream_threads):
+            out_q.put(_DONE)
+
+    closer = threading.Thread(target=close, name=f"{name}-closer", daemon=True)
+    closer.start()
+    return stats, closer
+
+
+def run_pipeline(jobs, operations, decode_threads=2, compute_threads=None,
+                 encode_threads=2, queue_size=8, seed=None, precision="uint8"):
+    """
+    Run (input_path, output_path) jobs through decode, filter and encode stages.
+
+    Args:
+        jobs: Iterable of (input_path, output_path); consumed lazily
+        operations: Ordered list of (name, params) as returned by parse_operation
+        decode_threads / compute_threads / encode_threads: Threads per stage
+            (compute defaults to the CPU count)
+        queue_size: Capacity of every inter-stage queue; at most about
+            queue_size images per stage are held in memory
+        seed: Seed for the noise operations; each job gets its own child
+            SeedSequence in input order
+        precision: Working precision passed to apply_operations
+
+    Returns:
+        Summary dict with images, failures, seconds, images_per_s, mb_per_s,
+        errors and per-stage statistics under 'stages'
+    """
+    compute_threads = compute_threads or os.cpu_count() or 1
+    pool = BufferPool()  # filter outputs are recycled once encoded
+    errors = []
+    total_bytes = [0]
+    bytes_lock = threading.Lock()
+
+    def decode(job):
+        path, out_path, child = job
+        image = utils.load_image(path)
+        with bytes_lock:
+            total_bytes[0] += os.path.getsize(path)
+        return path, out_path, image, child
+
+    def compute(item):
+        path, out_path, image, child = item
+        rng = np.random.default_rng(child) if child is not None else None
+        return path, out_path, apply_operations(image, operations, rng, pool, precision)
+
+    def encode(item):
+        path, out_path, image = item
+        try:
+            if not utils.save_image(image, out_path):
+                raise IOError(f"Could not write image: {out_path}")
+        finally:
+            pool.release(image)
+        return path
+
+    job_q = queue.Queue(maxsize=queue_size)
+    decoded_q = queue.Queue(maxsize=queue_size)
+    filtered_q = queue.Queue(maxsize=queue_size)
+
+    start = time.perf_counter()
+    decode_stats, _ = _start_stage("decode", decode, job_q, decoded_q,
+                                   decode_threads, compute_threads, errors)
+    compute_stats, _ = _start_stage("compute", compute, decoded_q, filtered_q,
+                                    compute_threads, encode_threads, errors)
+    encode_stats, encode_closer = _start_stage("encode", encode, filtered_q, None,
+                                               encode_threads, 0, errors)
+
+    # Feed lazily: put() blocks while the decoders are behind
+    root_seed = np.random.SeedSequence(seed) if seed is not None else None
+    for job in jobs:
+        child = root_seed.spawn(1)[0] if root_seed is not None else None
+        job_q.put(tuple(job) + (child,))
+    for _ in range(decode_threads):
+        job_q.put(_DONE)
+    encode_closer.join()
+
+    elapsed = time.perf_counter() - start
+    processed = encode_stats.items
+    stages = {s.name: s.as_dict(elapsed) for s in (decode_stats, compute_stats, encode_stats)}
+    return {
+        "images": processed,
+        "failures": len(errors),
+        "seconds": elapsed,
+        "images_per_s": processed / elapsed if elapsed > 0 else 0.0,
+        "mb_per_s": total_bytes[0] / 1e6 / elapsed if elapsed > 0 else 0.0,
+        "errors": errors,
+        "stages": stages,
+        "bottleneck": max(stages, key=lambda name: stages[name]["utilization"]),
+    }
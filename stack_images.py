@@ -0,0 +1,65 @@
+"""
+Merge a burst of aligned exposures into one low-noise image.
+
+Images are loaded one at a time, so the number of frames is not limited by
+memory: 'mean' keeps only running statistics, 'median' and 'sigma_clip'
+work through a temporary on-disk stack in row bands sized by --memory-mb.
+
+Example:
+    python stack_images.py "burst/*.jpg" -o stacked.png --method sigma_clip --memory-mb 512
+"""
+import argparse
+import sys
+import time
+
+import utils
+from batch_process import find_inputs
+from helpers.stacking_helpers import STACK_METHODS, stack_images
+
+
+def load_images(paths):
+    """Yield the images one by one so only the current frame is in memory"""
+    for path in paths:
+        yield utils.load_image(path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Stack aligned exposures to reduce noise.")
+    parser.add_argument("input", help="Input glob, e.g. 'burst/*.jpg'")
+    parser.add_argument("-o", "--output", required=True, help="Output image path")
+    parser.add_argument("--method", choices=STACK_METHODS, default="median",
+                        help="How the samples of each pixel are combined (default: median)")
+    parser.add_argument("--memory-mb", type=int, default=512,
+                        help="Working memory budget for median / sigma_clip bands")
+    parser.add_argument("--kappa", type=float, default=3.0,
+                        help="sigma_clip: reject samples this many standard deviations from the mean")
+    parser.add_argument("--iterations", type=int, default=3, help="sigma_clip: clipping passes")
+    parser.add_argument("--workdir", help="Directory for the temporary stack (default: system temp)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    paths = find_inputs(args.input)
+    if not paths:
+        print(f"No input files match: {args.input}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    try:
+        result = stack_images(load_images(paths), args.method, args.memory_mb, args.kappa,
+                              args.iterations, args.workdir)
+    except (IOError, ValueError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not utils.save_image(result, args.output):
+        print(f"Error: Could not write image: {args.output}", file=sys.stderr)
+        return 1
+    print(f"Stacked {len(paths)} images ({args.method}) in {time.perf_counter() - start:.2f} s "
+          f"-> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
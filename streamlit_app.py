@@ -2,7 +2,7 @@ import streamlit as st
 import numpy as np
 from PIL import Image
 import io
-from Quantitative_Proof import sobel_gradient_energy,variance_of_laplacian
+from Quantitative_Proof import focus_metrics
 
 from filters import (
     apply_brightness, apply_all_brightness_levels, apply_grayscale,
@@ -12,6 +12,10 @@ from helpers.brightness_helpers import get_brightness_description
 from noiseRemovalFilter import remove_noise
 from InvertColorFilter import apply_invert
 from helpers.noise_filter_helper import smooth_image_with_gaussian_blur, remove_noise_with_median_filter
+from helpers import profiling
+from helpers.cache_helpers import ResultCache, content_key
+from helpers.proxy_helpers import decode_proxy, scale_params
+from helpers.sharpener_helpers import Sharpener
 
 st.set_page_config(page_title="Image Enhancer", layout="wide")
 st.title("🖼️ Enhancer")
@@ -20,13 +24,58 @@ st.title("🖼️ Enhancer")
 uploaded_file = st.sidebar.file_uploader("Upload an image", type=["jpg", "png", "jpeg"])
 
 PREVIEW_WIDTH = 400  # Adjust this value for smaller or larger previews
+PROXY_WIDTH = 2 * PREVIEW_WIDTH  # Minimum width of the preview proxy (sharp on high-DPI screens)
+RESULT_CACHE_MB = 512  # Decoded uploads, filter outputs and encoded downloads kept across reruns
+
+
+@st.cache_resource
+def result_cache(max_mb=RESULT_CACHE_MB):
+    """One LRU for the server process; keys start with the upload's content hash"""
+    return ResultCache(max_bytes=max_mb * 1024 * 1024)
+
+
+def encode_jpeg(image):
+    buf = io.BytesIO()
+    Image.fromarray(image.astype(np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+show_timings = st.sidebar.checkbox("Show timings", value=False)
+track_memory = st.sidebar.checkbox("Track memory (slower)", value=False, disabled=not show_timings)
+if show_timings:
+    profiling.reset()  # one run of the script per table
+    profiling.enable(memory=track_memory)
+else:
+    profiling.disable()
+
+fast_preview = st.sidebar.checkbox("Fast low-resolution preview", value=True,
+                                   help="Filter a reduced copy for the preview; the download is rendered at full resolution")
 
 if uploaded_file:
-    pil_img = Image.open(uploaded_file)
-    img = np.array(pil_img)
+    # Every widget change reruns the script: decode and filter once per
+    # (upload content, operation, parameters) and look the result up afterwards
+    cache = result_cache()
+    data = uploaded_file.getvalue()
+    upload_key = content_key(data)
+
+    def full_image():
+        return cache.get_or_compute((upload_key, "decode"), lambda: np.array(Image.open(io.BytesIO(data))))
+
+    # Previews are computed on a proxy decoded at reduced resolution, with
+    # kernel sizes and sigmas scaled to match; only the download is full size
+    if fast_preview:
+        img_key = (upload_key, "proxy", PROXY_WIDTH)
+        img, scale = cache.get_or_compute(img_key, lambda: decode_proxy(data, PROXY_WIDTH))
+        if scale == 1.0:
+            img_key = (upload_key, "decode")
+    else:
+        img_key, img, scale = (upload_key, "decode"), full_image(), 1.0
+
+    def result_key(image_key, func, params):
+        return image_key + (func.__name__,) + tuple(sorted(params.items()))
 
     # Show original image at a fixed width
-    st.image(pil_img, caption="Original Image", width=PREVIEW_WIDTH)
+    st.image(img, caption="Original Image", width=PREVIEW_WIDTH)
 
     operation = st.sidebar.selectbox("Choose Operation", [
         "None/Preview",
@@ -42,58 +91,59 @@ if uploaded_file:
         "Image Sharpening"
     ])
 
-    result = img.copy()
+    func, params = None, {}
     out_filename = "output.jpg"
 
     if operation == "Brightness":
         lvl = st.sidebar.slider("Brightness Level", -4, 4, 0)
-        result = apply_brightness(img, lvl)
+        func, params = apply_brightness, {"level": lvl}
         out_filename = f"brightness_{lvl:+d}.jpg"
         st.caption(f"Brightness level {lvl} ({get_brightness_description(lvl)})")
 
     elif operation == "Grayscale":
-        result = apply_grayscale(img)
+        func = apply_grayscale
         out_filename = "grayscale.jpg"
 
     elif operation == "Add Gaussian Noise":
         intensity = st.sidebar.slider("Gaussian Noise Intensity", 0.0, 1.0, 0.2)
-        result = add_gaussian_noise(img, intensity)
+        # Same noise pattern on every rerun; slider moves only rescale it
+        func, params = add_gaussian_noise, {"intensity": intensity, "seed": 0, "reuse_field": True}
         out_filename = f"gaussian_{intensity:.2f}.jpg"
 
     elif operation == "Add Salt & Pepper Noise":
         intensity = st.sidebar.slider("Salt & Pepper Intensity", 0.0, 1.0, 0.2)
-        result = add_salt_pepper_noise(img, intensity)
+        func, params = add_salt_pepper_noise, {"intensity": intensity, "seed": 0, "reuse_field": True}
         out_filename = f"saltpep_{intensity:.2f}.jpg"
 
     elif operation == "Denoise (Gaussian)":
         sigma = st.sidebar.slider("Gaussian Sigma", 0.5, 2.0, 1.0)
-        result = smooth_image_with_gaussian_blur(img, sigma)
+        func, params = smooth_image_with_gaussian_blur, {"sigma": sigma}
         out_filename = f"denoised_gaussian_{sigma:.1f}.jpg"
 
     elif operation == "Denoise (Median)":
         kernel = st.sidebar.select_slider("Median Kernel Size", options=[3, 5, 7], value=3)
-        result = remove_noise_with_median_filter(img, kernel)
+        func, params = remove_noise_with_median_filter, {"kernel_size": kernel}
         out_filename = f"denoised_median_{kernel}.jpg"
 
     elif operation == "Noise Removal Tool":
         method = st.sidebar.radio("Method", ["Median", "Gaussian", "Bilateral"])
         if method == "Median":
-            result = remove_noise(img, method="median", ksize=5)
+            func, params = remove_noise, {"method": "median", "ksize": 5}
             out_filename = "denoised_median.jpg"
         elif method == "Gaussian":
-            result = remove_noise(img, method="gaussian", ksize=(5, 5), sigma=0)
+            func, params = remove_noise, {"method": "gaussian", "ksize": (5, 5), "sigma": 0}
             out_filename = "denoised_gaussian.jpg"
         else:
-            result = remove_noise(img, method="bilateral", d=9, sigma_color=75, sigma_space=75)
+            func, params = remove_noise, {"method": "bilateral", "d": 9, "sigma_color": 75, "sigma_space": 75}
             out_filename = "denoised_bilateral.jpg"
 
     elif operation == "Invert Colors":
-        result = apply_invert(img)
+        func = apply_invert
         out_filename = "inverted.jpg"
 
     elif operation == "Edge Detection":
         sensitivity = st.sidebar.slider("Sensitivity", 0.1, 2.0, 1.0)
-        result = apply_edge_detection(img, sensitivity, 'both')
+        func, params = apply_edge_detection, {"sensitivity": sensitivity, "direction": 'both'}
         out_filename = f"edges_both_{sensitivity:.1f}.jpg"
 
 
@@ -107,34 +157,71 @@ if uploaded_file:
 
         threshold = st.sidebar.slider("Threshold", 0, 50, 10)
 
-        result = unsharp_mask( img,ksize=(ksize, ksize), sigma=sigma,amount=amount,threshold=threshold )
+        func, params = unsharp_mask, {"ksize": (ksize, ksize), "sigma": sigma, "amount": amount, "threshold": threshold}
 
         out_filename = f"sharpen_k{ksize}_σ{sigma:.1f}_a{amount:.1f}_t{threshold}.jpg"
-        # Compute verification metrics
-        fm_orig = variance_of_laplacian(img)
-        fm_sharp = variance_of_laplacian(result)
-        se_orig = sobel_gradient_energy(img)
-        se_sharp = sobel_gradient_energy(result)
-
-        # Show result
-        st.image(result, caption="Result: Sharpen", width=PREVIEW_WIDTH)
-        st.markdown("**🔍 Focus Metrics**")
-        c1, c2 = st.columns(2)
-        with c1:
-            st.metric("Variance of Laplacian", f"{fm_sharp:.2f}", delta=f"{fm_sharp - fm_orig:.2f}")
-        with c2:
-            st.metric("Sobel Energy", f"{se_sharp:.0f}", delta=f"{se_sharp - se_orig:.0f}")
 
     else:
         st.info("Choose an operation from the sidebar to process your image!")
 
     # Show and Download Result
-    if operation != "None/Preview":
-        # Show result image at the same fixed width
-        st.image(result, caption=f"Result: {operation}", width=PREVIEW_WIDTH)
+    if func is not None:
+        preview_params = scale_params(params, scale)
+        if func is unsharp_mask:
+            # Same result as unsharp_mask, but the blur of this image and
+            # (ksize, sigma) is kept, so amount/threshold moves only recombine
+            sharpener_key = img_key + ("Sharpener",)
+            sharpener = cache.get_or_compute(sharpener_key, lambda: Sharpener(img))
+            render_preview = lambda: sharpener.sharpen(**preview_params)
+        else:
+            render_preview = lambda: func(img, **preview_params)
+        result = cache.get_or_compute(result_key(img_key, func, preview_params), render_preview)
+        if func is unsharp_mask:
+            cache.put(sharpener_key, sharpener)  # account for the layers it cached
+        suffix = f" (preview, {img.shape[1]} px wide)" if scale < 1.0 else ""
+
+        if operation == "Image Sharpening":
+            # Compute verification metrics
+            # One pass per image; the original's metrics are memoized across reruns
+            orig_metrics = focus_metrics(img)
+            sharp_metrics = focus_metrics(result)
+            fm_orig, fm_sharp = orig_metrics["laplacian_var"], sharp_metrics["laplacian_var"]
+            se_orig, se_sharp = orig_metrics["sobel_energy"], sharp_metrics["sobel_energy"]
+
+            # Show result
+            st.image(result, caption="Result: Sharpen" + suffix, width=PREVIEW_WIDTH)
+            st.markdown("**🔍 Focus Metrics**" + suffix)
+            c1, c2 = st.columns(2)
+            with c1:
+                st.metric("Variance of Laplacian", f"{fm_sharp:.2f}", delta=f"{fm_sharp - fm_orig:.2f}")
+            with c2:
+                st.metric("Sobel Energy", f"{se_sharp:.0f}", delta=f"{se_sharp - se_orig:.0f}")
 
-        buf = io.BytesIO()
-        Image.fromarray(result.astype(np.uint8)).save(buf, format="JPEG")
-        st.download_button("Download Result", buf.getvalue(), file_name=out_filename, mime="image/jpeg")
+        # Show result image at the same fixed width
+        st.image(result, caption=f"Result: {operation}" + suffix, width=PREVIEW_WIDTH)
+
+        # The download is rendered at full resolution (unless the preview
+        # already is) and encoded only when asked for, then cached
+        jpeg_key = result_key((upload_key, "decode"), func, params) + ("jpeg",)
+        if jpeg_key in cache or st.button("Prepare download"):
+            render = (lambda: result) if scale == 1.0 else (lambda: func(full_image(), **params))
+            jpeg = cache.get_or_compute(jpeg_key, lambda: encode_jpeg(render()))
+            st.download_button("Download Result", jpeg, file_name=out_filename, mime="image/jpeg")
+
+    if show_timings:
+        with st.expander("⏱ Timings", expanded=True):
+            rows = profiling.summary()
+            if rows:
+                st.dataframe([{
+                    "Operation": row["op"],
+                    "Calls": row["calls"],
+                    "Wall (ms)": round(1000 * row["wall_s"], 1),
+                    "CPU (ms)": round(1000 * row["cpu_s"], 1),
+                    "Peak memory (MB)": None if row["peak_bytes"] is None else round(row["peak_bytes"] / 1e6, 1),
+                    "Megapixels": round(row["megapixels"], 2),
+                    "MP/s": round(row["mp_per_s"], 1),
+                } for row in rows])
+            else:
+                st.caption("No operations ran.")
 else:
     st.info("Please upload an image to get started!")
@@ -1,8 +1,10 @@
 # Generic Utility functions for the project
 # may be even removed
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -18,17 +20,79 @@ def load_image(path):
     return image
 
 
-def save_image(image, path):
-    """Save an image to the specified path"""
+def encoder_params(path, quality=None, optimize=False, progressive=False, png_compression=None):
+    """
+    cv2.imwrite flags for the file type of path.
+
+    quality: JPEG / WebP quality (0-100, OpenCV default 95; WebP above 100 is lossless)
+    optimize, progressive: JPEG Huffman optimization and progressive scan
+        (smaller files, slower encode)
+    png_compression: PNG zlib level 0-9 (OpenCV default 1; higher is smaller and slower)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    params = []
+    if ext in (".jpg", ".jpeg"):
+        if quality is not None:
+            params += [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        if optimize:
+            params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        if progressive:
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+    elif ext == ".png":
+        if png_compression is not None:
+            params += [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+    elif ext == ".webp":
+        if quality is not None:
+            params += [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    return params
+
+
+def save_image(image, path, **encoder):
+    """
+    Save an image to the specified path.
+    Keyword arguments are encoder settings, see encoder_params().
+    """
     directory = os.path.dirname(path)
     if directory and not os.path.exists(directory):
         os.makedirs(directory, exist_ok=True)
 
-    return cv2.imwrite(path, image)
+    return cv2.imwrite(path, image, encoder_params(path, **encoder))
+
+
+def save_images(items, workers=2, **encoder):
+    """
+    Encode and write (image, path) pairs on a pool of encoder threads.
+
+    items is consumed lazily and at most `workers` images wait for an
+    encoder at any time, so a generator producing the images keeps memory
+    at a few frames. cv2.imwrite releases the GIL, so encodes overlap with
+    each other and with producing the next image.
+
+    Returns:
+        List of the paths that could not be written
+    """
+    failed, pending = [], deque()
+
+    def collect_oldest():
+        path, future = pending.popleft()
+        if not future.result():
+            failed.append(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for image, path in items:
+            pending.append((path, executor.submit(save_image, image, path, **encoder)))
+            if len(pending) >= workers:
+                collect_oldest()  # wait before producing another image
+        while pending:
+            collect_oldest()
+    return failed
 
 
 def display_comparison(original, filtered, title="Comparison"):
     """Display a side-by-side comparison of original and filtered images"""
+    # Imported here so headless tools (batch processing, workers) never load matplotlib
+    import matplotlib.pyplot as plt
+
     # Convert from BGR to RGB for display
     orig_rgb = cv2.cvtColor(original, cv2.COLOR_BGR2RGB)
     filtered_rgb = cv2.cvtColor(filtered, cv2.COLOR_BGR2RGB)
@@ -0,0 +1,251 @@
+"""
+Apply a filter chain to video files and live camera streams.
+
+A producer thread reads frames into a bounded queue, a thread pool runs the
+chain on several frames at once (OpenCV and NumPy release the GIL), and
+results are written through cv2.VideoWriter strictly in frame order. At most
+queue_size + in_flight frames are held in memory, whatever the length of
+the video.
+
+Live sources (camera indices) never block the capture: when processing falls
+behind, new frames are dropped and counted instead.
+
+An optional temporal denoiser runs on the ordered output of the pool, after
+the (per-frame, spatial) filter chain.
+
+Example:
+    python video_process.py clip.mp4 -o clip_sharp.mp4 --op denoise --op sharpen -w 4
+    python video_process.py 0 -o webcam.mp4 --op edges --max-frames 300
+    python video_process.py noisy.mp4 -o clean.mp4 --temporal mean --temporal-window 5
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import utils
+from helpers.temporal_denoise_helpers import TEMPORAL_METHODS, TemporalDenoiser
+from operations import OPERATIONS, parse_operation, apply_operations
+
+_DONE = object()  # end-of-stream marker from the producer
+DEFAULT_FPS = 30.0
+
+
+def is_live(source):
+    """Camera indices (ints or digit strings) are live; everything else is a file or URL"""
+    return isinstance(source, int) or str(source).isdigit()
+
+
+def open_capture(source):
+    """Open a cv2.VideoCapture for a file path, URL or camera index"""
+    capture = cv2.VideoCapture(int(source) if is_live(source) else source)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+    return capture
+
+
+def _produce(capture, frame_q, stop, drop, max_frames, counters):
+    """Read frames into frame_q until the source ends, max_frames is reached or stop is set"""
+    try:
+        while not stop.is_set() and (max_frames is None or counters["read"] < max_frames):
+            ok, frame = capture.read()
+            if not ok:
+                break
+            counters["read"] += 1
+            if drop:
+                try:
+                    frame_q.put_nowait(frame)
+                except queue.Full:
+                    counters["dropped"] += 1  # the camera does not wait for us
+            else:
+                frame_q.put(frame)  # blocks while the workers are behind
+    finally:
+        frame_q.put(_DONE)
+
+
+def _open_writer(path, frame, fps, fourcc):
+    """VideoWriter sized (and colour/gray) after the first processed frame"""
+    utils.ensure_dir_exists(os.path.dirname(path) or ".")
+    height, width = frame.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height),
+                             frame.ndim == 3)
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer: {path}")
+    return writer
+
+
+def process_stream(source, operations, output_path=None, workers=None, queue_size=4,
+                   in_flight=None, drop_frames=None, max_frames=None, fourcc="mp4v",
+                   seed=None, temporal=None):
+    """
+    Run a filter chain over every frame of a video source.
+
+    Args:
+        source: Video file / URL, or camera index (int or digit string)
+        operations: Ordered list of (name, params) as returned by parse_operation
+        output_path: Video file to write, or None to only measure
+        workers: Filter threads (default: CPU count)
+        queue_size: Frames buffered between the reader and the workers
+        in_flight: Frames being filtered at once (default: 2 per worker)
+        drop_frames: Drop frames instead of blocking the reader when the
+            workers are behind (default: True for live sources only)
+        max_frames: Stop after this many frames (needed to end a camera capture
+            other than with Ctrl+C)
+        fourcc: Four-character codec code for the output
+        seed: Seed for the noise operations; each frame gets its own child SeedSequence
+        temporal: Optional TemporalDenoiser applied to the filtered frames in order
+
+    Returns:
+        Summary dict with frames_read, frames_written, dropped, seconds, fps,
+        source_fps and realtime (processing speed relative to the source rate)
+    """
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 2 * workers
+    drop = is_live(source) if drop_frames is None else drop_frames
+
+    capture = open_capture(source)
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    frame_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    counters = {"read": 0, "dropped": 0}
+    root_seed = np.random.SeedSequence(seed) if seed is not None else None
+
+    def filter_frame(frame, child):
+        rng = np.random.default_rng(child) if child is not None else None
+        # Views (e.g. broadcast grayscale) must be made contiguous for the writer
+        return np.ascontiguousarray(apply_operations(frame, operations, rng))
+
+    producer = threading.Thread(target=_produce, name="video-reader", daemon=True,
+                                args=(capture, frame_q, stop, drop, max_frames, counters))
+    writer = None
+    written = 0
+    pending = deque()
+
+    def write_oldest():
+        nonlocal writer, written
+        frame = pending.popleft().result()
+        if temporal is not None:
+            frame = temporal.update(frame)  # stateful, so it runs here, in frame order
+        if output_path is not None:
+            if writer is None:
+                writer = _open_writer(output_path, frame, source_fps, fourcc)
+            writer.write(frame)
+        written += 1
+
+    start = time.perf_counter()
+    producer.start()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video-filter")
+    try:
+        while True:
+            frame = frame_q.get()
+            if frame is _DONE:
+                break
+            child = root_seed.spawn(1)[0] if root_seed is not None else None
+            pending.append(executor.submit(filter_frame, frame, child))
+            if len(pending) >= in_flight:
+                write_oldest()  # results leave in submission order
+        while pending:
+            write_oldest()
+    except KeyboardInterrupt:
+        print("Stopping...", file=sys.stderr)
+    finally:
+        stop.set()
+        while producer.is_alive():  # unblock a reader waiting on a full queue
+            try:
+                frame_q.get_nowait()
+            except queue.Empty:
+                producer.join(0.05)
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+        capture.release()
+        if writer is not None:
+            writer.release()
+
+    elapsed = time.perf_counter() - start
+    fps = written / elapsed if elapsed > 0 else 0.0
+    return {
+        "frames_read": counters["read"],
+        "frames_written": written,
+        "dropped": counters["dropped"],
+        "seconds": elapsed,
+        "fps": fps,
+        "source_fps": source_fps,
+        "realtime": fps / source_fps if source_fps else 0.0,
+    }
+
+
+def print_summary(summary):
+    """Print the throughput summary of a video run"""
+    print("\n===== Video Summary =====")
+    print(f"Frames    : {summary['frames_written']} written of {summary['frames_read']} read "
+          f"in {summary['seconds']:.2f} s")
+    print(f"Throughput: {summary['fps']:.2f} fps sustained "
+          f"({summary['realtime']:.2f}x the source's {summary['source_fps']:.2f} fps)")
+    print(f"Dropped   : {summary['dropped']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Apply a chain of filters to a video file or camera stream.")
+    parser.add_argument("source", help="Video file, stream URL or camera index (e.g. 0)")
+    parser.add_argument("-o", "--output", help="Output video file (omit to only measure throughput)")
+    parser.add_argument("--op", dest="operations", action="append", default=[],
+                        metavar="NAME[:key=value,...]",
+                        help=f"Operation to apply, repeat for a chain (in order). "
+                             f"Available: {', '.join(OPERATIONS)}")
+    parser.add_argument("--temporal", choices=TEMPORAL_METHODS,
+                        help="Temporal denoising over previous frames, after the --op chain")
+    parser.add_argument("--temporal-window", type=int, default=5,
+                        help="Frames averaged by --temporal mean/median")
+    parser.add_argument("--temporal-alpha", type=float, default=0.2,
+                        help="Weight of the newest frame for --temporal ema")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of filter threads (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=4, help="Frames buffered ahead of the workers")
+    parser.add_argument("--in-flight", type=int, help="Frames filtered at once (default: 2 per worker)")
+    drop = parser.add_mutually_exclusive_group()
+    drop.add_argument("--drop", dest="drop_frames", action="store_true", default=None,
+                      help="Drop frames when processing falls behind (default for cameras)")
+    drop.add_argument("--no-drop", dest="drop_frames", action="store_false",
+                      help="Never drop frames, slow the reader down instead (default for files)")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames")
+    parser.add_argument("--fourcc", default="mp4v", help="Output codec (default: mp4v)")
+    parser.add_argument("--seed", type=int, help="Seed for the noise operations")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not args.operations and not args.temporal:
+        print("Error: give at least one --op or --temporal", file=sys.stderr)
+        return 2
+
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+        temporal = (TemporalDenoiser(args.temporal, args.temporal_window, args.temporal_alpha)
+                    if args.temporal else None)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        summary = process_stream(args.source, operations, args.output, args.workers,
+                                 args.queue_size, args.in_flight, args.drop_frames,
+                                 args.max_frames, args.fourcc, args.seed, temporal)
+    except IOError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+Incremental watch-folder mode.
+
+Keeps a manifest of every processed input (size, mtime, content hash and the
+hash of the operation chain) and only sends new or changed files to the
+worker pool. Unchanged files cost one stat() per scan; if the optional
+`watchdog` package is installed, filesystem events replace the directory
+scans entirely.
+
+Example:
+    python watch_folder.py "incoming/*.jpg" -o processed --op denoise --op sharpen
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import utils
+from batch_process import find_inputs, print_summary, run_batch
+from operations import OPERATIONS, parse_operation
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional, fall back to polling
+    Observer = None
+
+MANIFEST_NAME = ".enhancer_manifest.json"
+
+
+def chain_hash(operations):
+    """Stable hash of an ordered (name, params) operation chain"""
+    text = json.dumps([[name, params] for name, params in operations], sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    On-disk record of processed inputs: path -> size, mtime, hash, chain.
+
+    failures holds the same kind of entry for inputs that failed in this
+    session. They are not retried until their content or the chain changes,
+    and not saved, so a restarted watcher tries them again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.failures = {}
+        self.dirty = False
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        """Write the manifest atomically so an interrupted run never corrupts it"""
+        utils.ensure_dir_exists(os.path.dirname(self.path) or ".")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def check(self, path, chain):
+        """
+        Decide whether path has to be processed.
+
+        Returns:
+            None if the recorded output is still valid, otherwise the new
+            manifest entry to store once processing succeeds
+        """
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        failure = self.failures.get(path)
+        for known in (entry, failure):
+            if known and known["chain"] == chain and known["size"] == stat.st_size \
+                    and known["mtime"] == stat.st_mtime:
+                return None  # fast path: no read, no hash
+
+        content = file_hash(path)
+        new_entry = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": content, "chain": chain}
+        if entry and entry["chain"] == chain and entry["hash"] == content:
+            self.entries[path] = new_entry  # touched but unchanged
+            self.dirty = True
+            return None
+        if failure and failure["chain"] == chain and failure["hash"] == content:
+            self.failures[path] = new_entry  # touched but still the input that failed
+            return None
+        return new_entry
+
+
+def find_changes(paths, manifest, chain, min_age=0.0):
+    """
+    Return {path: entry} for the paths that are new or changed.
+
+    Files modified less than min_age seconds ago are skipped (and picked up by
+    a later scan) so half-written uploads are not processed.
+    """
+    now = time.time()
+    changes = {}
+    for path in paths:
+        try:
+            if now - os.path.getmtime(path) < min_age:
+                continue
+            entry = manifest.check(path, chain)
+        except OSError:
+            continue  # removed while scanning
+        if entry is not None:
+            changes[path] = entry
+    return changes
+
+
+def process_changes(changes, operations, output_dir, manifest, workers=None, input_root=None,
+                    executor=None):
+    """
+    Run the changed files through the worker pool and record the successes
+    (and, until their content changes, the failures).
+    executor: a running ProcessPoolExecutor to reuse (see run_batch)
+    """
+    paths = sorted(changes)
+    summary = run_batch(paths, operations, output_dir, workers, input_root=input_root,
+                        executor=executor)
+    failed = {path for path, _ in summary["errors"]}
+    for path in paths:
+        if path in failed:
+            manifest.failures[path] = changes[path]
+        else:
+            manifest.entries[path] = changes[path]
+            manifest.failures.pop(path, None)
+    manifest.save()
+    return summary
+
+
+class _ChangeCollector(FileSystemEventHandler if Observer else object):
+    """watchdog handler that collects created/modified paths matching the pattern"""
+
+    def __init__(self, pattern):
+        self.pattern = os.path.abspath(pattern)
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def _add(self, path):
+        path = os.path.abspath(path)
+        if fnmatch.fnmatch(path, self.pattern):
+            with self.lock:
+                self.pending.add(path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._add(event.dest_path)
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, set()
+        return pending
+
+
+def _watch_root(pattern):
+    """Directory part of a glob pattern, before the first wildcard"""
+    head = pattern
+    while any(char in head for char in "*?["):
+        head = os.path.dirname(head)
+    return head or "."
+
+
+def watch(pattern, operations, output_dir, workers=None, interval=2.0, min_age=1.0,
+          once=False, manifest_path=None, use_events=True):
+    """
+    Process new or changed files matching pattern until interrupted.
+
+    Args:
+        pattern: Input glob
+        operations: Ordered list of (name, params)
+        output_dir: Where processed images (and the manifest) are written
+        workers: Worker processes, started with the first batch and kept for
+            the whole session (1 = process in this process)
+        interval: Seconds between polls / event batches
+        min_age: Ignore files modified less than this many seconds ago
+        once: Do a single catch-up pass and return
+        manifest_path: Manifest location (default: output_dir/.enhancer_manifest.json)
+        use_events: Use watchdog filesystem events when available
+    """
+    manifest = Manifest(manifest_path or os.path.join(output_dir, MANIFEST_NAME))
+    chain = chain_hash(operations)
+    output_root = os.path.abspath(output_dir)
+    # Fixed root so every incremental batch maps inputs to the same output paths
+    input_root = os.path.abspath(_watch_root(pattern))
+
+    def inputs(paths):
+        # Never feed our own outputs back in when output_dir is below the input dir
+        return [os.path.abspath(p) for p in paths
+                if not os.path.abspath(p).startswith(output_root + os.sep)]
+
+    # One worker pool for the whole session, so batches after the first do
+    # not pay for process start-up and module imports again
+    executor = None
+    retry = set()  # files of a batch that a dead worker pool left unprocessed
+
+    def run(paths):
+        nonlocal executor, retry
+        changes = find_changes(inputs(set(paths) | retry), manifest, chain, min_age)
+        previous_retry, retry = retry, set()
+        if changes:
+            if executor is None and workers != 1:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            print(f"Processing {len(changes)} new or changed image(s)...")
+            try:
+                print_summary(process_changes(changes, operations, output_dir, manifest, workers,
+                                              input_root, executor))
+            except BrokenProcessPool:
+                # A worker died; start a new pool and retry these files on the next
+                # scan. A batch that breaks the pool twice is recorded as failed,
+                # so a file that crashes the workers is not retried forever.
+                print("Worker pool failed, restarting it", file=sys.stderr)
+                executor.shutdown()
+                executor = None
+                if set(changes) <= previous_retry:
+                    print(f"Giving up on {len(changes)} image(s) until they change", file=sys.stderr)
+                    manifest.failures.update(changes)
+                else:
+                    retry = set(changes)
+        elif manifest.dirty:
+            manifest.save()
+        return changes
+
+    try:
+        # Catch up with everything that arrived while we were not running
+        run(find_inputs(pattern))
+        if not once:
+            _watch_loop(pattern, run, interval, min_age, use_events)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _watch_loop(pattern, run, interval, min_age, use_events):
+    """Feed new or changed paths to run() until interrupted"""
+    collector = None
+    if use_events and Observer is not None:
+        collector = _ChangeCollector(pattern)
+        observer = Observer()
+        observer.schedule(collector, _watch_root(pattern), recursive="**" in pattern)
+        observer.start()
+        print(f"Watching {pattern} (filesystem events)")
+    else:
+        print(f"Watching {pattern} (polling every {interval:g}s)")
+
+    deferred = set()
+    try:
+        while True:
+            time.sleep(interval)
+            if collector is None:
+                run(find_inputs(pattern))
+                continue
+            # Events only name the files that changed; recheck the ones that were too fresh
+            candidates = collector.take() | deferred
+            changes = run(candidates)
+            deferred = {p for p in candidates
+                        if p not in changes and os.path.isfile(p)
+                        and time.time() - os.path.getmtime(p) < min_age}
+    except KeyboardInterrupt:
+        print("Stopping watcher...")
+    finally:
+        if collector is not None:
+            observer.stop()
+            observer.join()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Process new or changed images as they arrive.")
+    parser.add_argument("input", help="Input glob, e.g. 'incoming/*.jpg'")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the processed images")
+    parser.add_argument("--op", dest="operations", action="append", required=True,
+                        metavar="NAME[:key=value,...]",
+                        help=f"Operation to apply, repeat for a chain (in order). "
+                             f"Available: {', '.join(OPERATIONS)}")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(),
+                        help="Number of worker processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between checks")
+    parser.add_argument("--min-age", type=float, default=1.0,
+                        help="Skip files modified less than this many seconds ago")
+    parser.add_argument("--manifest", help=f"Manifest path (default: OUTPUT_DIR/{MANIFEST_NAME})")
+    parser.add_argument("--poll", action="store_true", help="Always poll, even if watchdog is installed")
+    parser.add_argument("--once", action="store_true", help="Process pending changes once and exit")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        operations = [parse_operation(spec) for spec in args.operations]
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    utils.ensure_dir_exists(args.output_dir)
+    watch(args.input, operations, args.output_dir, args.workers, args.interval, args.min_age,
+          args.once, args.manifest, use_events=not args.poll)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())